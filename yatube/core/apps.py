@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from core.sqlite import configure_connection
+
+        connection_created.connect(
+            configure_connection, dispatch_uid='core.sqlite'
+        )
@@ -0,0 +1,189 @@
+"""Замеры запросов: время, SQL, шаблоны и кэш.
+
+InstrumentationMiddleware для доли запросов REQUEST_METRICS_SAMPLE_RATE
+собирает RequestMetrics и передает словарь с ними в приемник
+REQUEST_METRICS_SINK (по умолчанию - JSON-строка в лог yatube.requests).
+Остальные запросы проходят без замеров: обертки SQL не ставятся, а
+обертки шаблонов и кэша видят, что текущего замера нет, и сразу
+вызывают исходный метод.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('yatube.requests')
+
+# замер текущего запроса; None - запрос не попал в выборку
+current = ContextVar('request_metrics', default=None)
+
+MISSING = object()
+# сколько повторяющихся запросов и символов SQL попадает в отчет
+DUPLICATES_SHOWN = 5
+SQL_SHOWN = 200
+
+
+class RequestMetrics:
+    """Счетчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+        self.template_time = 0.0
+        self.rendering = False
+        self.reading_cache = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка выполнения SQL для connection.execute_wrapper."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        """Запросы, повторенные не меньше порога - признак N+1."""
+        threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        return [
+            {'sql': sql[:SQL_SHOWN], 'count': count}
+            for sql, count in self.statements.most_common(DUPLICATES_SHOWN)
+            if count >= threshold
+        ]
+
+    def as_dict(self, request, response):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round(
+                (time.perf_counter() - self.started) * 1000, 2
+            ),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'duplicates': self.duplicates(),
+            'template_ms': round(self.template_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def log_metrics(metrics):
+    """Приемник по умолчанию: строка JSON в лог yatube.requests."""
+    logger.info(json.dumps(metrics, ensure_ascii=False))
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(*args, **kwargs):
+        metrics = current.get()
+        # вложенные render_to_string считаются в объемлющем шаблоне
+        if metrics is None or metrics.rendering:
+            return render(*args, **kwargs)
+        metrics.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(*args, **kwargs)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.rendering = False
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        metrics = current.get()
+        # get внутри get_many (как в BaseCache.get_many) уже посчитан
+        if metrics is None or metrics.reading_cache:
+            return get(self, key, default, version)
+        metrics.reading_cache = True
+        try:
+            value = get(self, key, MISSING, version)
+        finally:
+            metrics.reading_cache = False
+        if value is MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        metrics = current.get()
+        if metrics is None or metrics.reading_cache:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        metrics.reading_cache = True
+        try:
+            result = get_many(self, keys, version)
+        finally:
+            metrics.reading_cache = False
+        metrics.cache_hits += len(result)
+        metrics.cache_misses += len(keys) - len(result)
+        return result
+    return wrapper
+
+
+def install():
+    """Ставит обертки рендеринга шаблонов и чтения из кэша (один раз)."""
+    if not hasattr(Template.render, '__wrapped__'):
+        Template.render = _timed_render(Template.render)
+    for options in settings.CACHES.values():
+        backend = import_string(options['BACKEND'])
+        if not hasattr(backend.get, '__wrapped__'):
+            backend.get = _counted_get(backend.get)
+            backend.get_many = _counted_get_many(backend.get_many)
+
+
+class InstrumentationMiddleware:
+    """Собирает RequestMetrics для выборки запросов.
+
+    При REQUEST_METRICS_SAMPLE_RATE = 0 Django исключает middleware
+    из цепочки, и замеры ничего не стоят.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not self.rate:
+            raise MiddlewareNotUsed
+        self.sink = import_string(settings.REQUEST_METRICS_SINK)
+        install()
+
+    def __call__(self, request):
+        if random.random() >= self.rate:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self.sink(metrics.as_dict(request, response))
+        return response
@@ -0,0 +1,38 @@
+"""Закрепление чтений пользователя за основной базой после записи.
+
+Запрос, который писал в базу, получает короткоживущую cookie; пока она
+есть, ReplicaRouter отправляет чтения этого браузера в основную базу.
+Cookie, а не состояние в памяти, работает и при нескольких процессах.
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import routers
+
+PIN_COOKIE = 'primary_db'
+
+
+class ReplicaPinMiddleware:
+    """Задает ReplicaRouter состояние текущего запроса.
+
+    Без реплик Django исключает middleware из цепочки.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = routers.RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = routers.current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.current.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
@@ -3,11 +3,16 @@ from django.db import models
 
 
 class CreatedModel(models.Model):
-    """Абстрактная модель. Добавляет дату создания."""
+    """Абстрактная модель. Добавляет дату создания и изменения."""
     pub_date = models.DateTimeField(
         'Дата создания',
         auto_now_add=True
     )
+    # по дате изменения строятся ETag и Last-Modified страниц
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         # Это абстрактная модель:
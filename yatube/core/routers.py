@@ -0,0 +1,74 @@
+# core/routers.py
+"""Разделение чтения и записи между основной базой и репликами.
+
+Все записи идут в основную базу (default), чтения в рамках запроса к
+сайту - в случайную реплику из DATABASE_REPLICAS. Запрос, который хоть
+раз писал, дальше читает из основной базы, а ReplicaPinMiddleware
+закрепляет за основной базой и чтения пользователя в следующие
+DATABASE_PIN_SECONDS секунд: реплика может отставать, а автор должен
+сразу видеть свой новый пост. Вне запросов (команды, фоновые потоки)
+чтения тоже идут в основную базу. То, что собирается для общего кэша,
+читается из основной базы внутри primary(): иначе страница из отстающей
+реплики осталась бы в кэше под новыми версиями.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+class RequestState:
+    """Чтения запроса закреплены за основной базой или он уже писал."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# состояние текущего запроса; None - чтение вне запроса к сайту
+current = ContextVar('replica_state', default=None)
+
+
+@contextmanager
+def primary(enabled=True):
+    """Чтения текущего запроса внутри блока идут в основную базу."""
+    state = current.get()
+    if not enabled or state is None:
+        yield
+        return
+    pinned = state.pinned
+    state.pinned = True
+    try:
+        yield
+    finally:
+        state.pinned = pinned
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        replicas = settings.DATABASE_REPLICAS
+        if state is None or state.pinned or state.wrote or not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии основной базы, связи между ними допустимы
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # реплики получают схему вместе с данными при синхронизации
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,92 @@
+# core/sqlite.py
+"""Профили настроек соединений SQLite и обслуживание базы.
+
+Профиль - набор PRAGMA из SQLITE_PROFILES, который выполняется на каждом
+новом соединении с базой. Профиль 'production' переводит базу в режим
+WAL, где читатели не ждут пишущих, и ослабляет синхронизацию с диском до
+фиксации WAL на контрольных точках. journal_mode и auto_vacuum хранятся
+в самом файле базы: они переживают смену профиля, а auto_vacuum у
+существующей базы включается только после полного VACUUM (maintain
+с full_vacuum).
+"""
+import sqlite3
+
+from django.conf import settings
+
+
+def profile(name=None):
+    """PRAGMA профиля name (по умолчанию - из SQLITE_PROFILE)."""
+    return settings.SQLITE_PROFILES[name or settings.SQLITE_PROFILE]
+
+
+def apply_pragmas(cursor, pragmas):
+    # значения берутся из настроек, а не из запроса, поэтому
+    # подставляются в текст PRAGMA, которая не принимает параметров
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.fetchall()
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Выполняет PRAGMA профиля на новом соединении SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = profile()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
+
+
+def backup(connection, path):
+    """Согласованная копия базы соединения connection в файл path.
+
+    Копия снимается одним шагом backup API SQLite, читатели на это время
+    не блокируются; у соединения не должно быть открытой транзакции.
+    """
+    target = sqlite3.connect(path)
+    try:
+        with connection.cursor():
+            connection.connection.backup(target)
+    finally:
+        target.close()
+
+
+def _pragma(cursor, name):
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()
+
+
+def maintain(connection, vacuum_pages=0, full_vacuum=False):
+    """Плановое обслуживание базы SQLite.
+
+    Обновляет статистику планировщика (ANALYZE), возвращает ОС свободные
+    страницы (incremental_vacuum, vacuum_pages - сколько за раз, 0 - все)
+    и переносит WAL в файл базы с усечением журнала. full_vacuum
+    перестраивает базу целиком - это нужно один раз, чтобы включить
+    auto_vacuum = INCREMENTAL у существующей базы, и блокирует запись на
+    все время работы.
+    """
+    with connection.cursor() as cursor:
+        free_before = _pragma(cursor, 'freelist_count')[0]
+        cursor.execute('ANALYZE')
+        if full_vacuum:
+            cursor.execute('VACUUM')
+        else:
+            cursor.execute(f'PRAGMA incremental_vacuum({int(vacuum_pages)})')
+            cursor.fetchall()
+        free_after = _pragma(cursor, 'freelist_count')[0]
+        journal_mode = _pragma(cursor, 'journal_mode')[0]
+        checkpoint = None
+        if journal_mode == 'wal':
+            busy, log, checkpointed = _pragma(
+                cursor, 'wal_checkpoint(TRUNCATE)'
+            )
+            checkpoint = {
+                'busy': bool(busy), 'log': log, 'checkpointed': checkpointed
+            }
+        return {
+            'journal_mode': journal_mode,
+            'auto_vacuum': _pragma(cursor, 'auto_vacuum')[0],
+            'freed_pages': free_before - free_after,
+            'checkpoint': checkpoint,
+        }
@@ -1,6 +1,61 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
 
 from .models import Comment, Follow, Group, Post
+from .paginators import EstimatedCountPaginator
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    """Фильтр по имени пользователя, которое вводится в текстовое поле.
+
+    Обычный list_filter по внешнему ключу выводит в боковой панели
+    всех пользователей базы.
+    """
+    template = 'admin/input_filter.html'
+    # внешний ключ на пользователя, по которому фильтруется список
+    field = None
+
+    def lookups(self, request, model_admin):
+        # без вариантов Django не показывает фильтр
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                **{f'{self.field}__username': self.value()}
+            )
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            # остальные параметры списка сохраняются при отправке формы
+            'query_parts': [
+                (name, value) for name, value in changelist.params.items()
+                if name not in (self.parameter_name, PAGE_VAR)
+            ],
+        }
+
+
+class AuthorFilter(UsernameFilter):
+    title = 'автор'
+    parameter_name = 'author'
+    field = 'author'
+
+
+class UserFilter(UsernameFilter):
+    title = 'подписчик'
+    parameter_name = 'user'
+    field = 'user'
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Список без COUNT(*) по всей таблице на каждую загрузку."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -13,7 +68,7 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -22,30 +77,49 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', AuthorFilter)
+    autocomplete_fields = ('author',)
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # группы выбираются один раз на запрос, а не для каждой строки
+            # list_editable; iter() - чтобы list() не делал еще и COUNT(*)
+            if not hasattr(request, 'group_choices'):
+                request.group_choices = list(iter(field.choices))
+            field.choices = request.group_choices
+        return field
+
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'post',
         'author',
         'text',
     )
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
-    list_filter = ('author',)
+    list_filter = (AuthorFilter,)
+    autocomplete_fields = ('post', 'author')
+    # по убыванию ключа список читается с конца таблицы без сортировки
+    ordering = ('-pk',)
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'user',
         'author',
     )
-    list_filter = ('user', 'author',)
+    list_select_related = ('user', 'author')
+    list_filter = (UserFilter, AuthorFilter)
+    autocomplete_fields = ('user', 'author')
+    ordering = ('-pk',)
     empty_value_display = '-пусто-'
 
 
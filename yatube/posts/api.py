@@ -0,0 +1,218 @@
+# posts/api.py
+"""JSON API лент только для чтения, версия 1.
+
+Главная, лента группы, автора и подписок отдаются документами постов
+{"results": [...], "next": "<курсор>"}; следующая порция - с ?after=
+<курсор>. Посты читаются через values() одним запросом вместе с автором и
+группой, без экземпляра модели на строку. ?fields=id,excerpt оставляет в
+документах только перечисленные поля и выбирает из базы только нужные
+для них столбцы. Новые посты можно ждать long-poll запросом к
+api/v1/posts/new/?since=<id последнего поста>.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.text import Truncator
+from django.views.decorators.cache import never_cache
+
+from . import notify, pagecache
+from .conditional import cache_headers
+from .models import Group, Post
+from .paginators import cursor_token, decode_cursor, keyset_window
+from .thumbnails import ready_thumbnails
+from .timeline import follow_feed
+
+User = get_user_model()
+
+# столбцы, без которых не построить курсор и теги кэша страниц
+BASE_COLUMNS = ('id', 'pub_date', 'author_id', 'group_id')
+
+
+def _column(name):
+    def value(row, request):
+        return row[name]
+    return value
+
+
+def _pub_date(row, request):
+    return row['pub_date'].isoformat()
+
+
+def _excerpt(row, request):
+    return Truncator(row['text']).chars(settings.API_EXCERPT_LENGTH)
+
+
+def _thumbnail(row, request):
+    # как и на страницах: готовая миниатюра, пока ее нет - оригинал
+    if not row['image']:
+        return None
+    image = row['ready_thumbnail']
+    url = image.url if image else default_storage.url(row['image'])
+    return request.build_absolute_uri(url)
+
+
+# поле документа: нужные ему столбцы values() и функция значения
+FIELDS = {
+    'id': ((), _column('id')),
+    'pub_date': ((), _pub_date),
+    'excerpt': (('text',), _excerpt),
+    'author': (('author__username',), _column('author__username')),
+    'group': (('group__slug',), _column('group__slug')),
+    'thumbnail': (('image',), _thumbnail),
+    'comments_count': (('comments_count',), _column('comments_count')),
+}
+
+
+def _json(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def _fields(request):
+    """Запрошенные поля документа; ValueError для неизвестных."""
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(FIELDS)
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = sorted(set(fields) - FIELDS.keys())
+    if unknown:
+        raise ValueError('Неизвестные поля: ' + ', '.join(unknown))
+    return fields
+
+
+def _window(source, request, columns, limit):
+    after = request.GET.get('after')
+    cursor = decode_cursor(after) if after else None
+    # лента подписок собирает окно сама, как и для CursorPaginator
+    window = getattr(source, 'values_window', None)
+    if window is not None:
+        return window(cursor, limit, columns)
+    return keyset_window(source.values(*columns), 'after', cursor, limit)
+
+
+def _tags(rows):
+    # то же, что pagecache.posts_tags, но для строк values()
+    tags = set()
+    for row in rows:
+        tags.add(pagecache.post_tag(row['id']))
+        tags.add(pagecache.user_tag(row['author_id']))
+        if row['group_id'] is not None:
+            tags.add(pagecache.group_tag(row['group_id']))
+    return tags
+
+
+def _columns(fields):
+    columns = set(BASE_COLUMNS)
+    for field in fields:
+        columns.update(FIELDS[field][0])
+    return columns
+
+
+def _documents(request, fields, rows):
+    if 'thumbnail' in fields:
+        # готовность миниатюр проверяется разом для всей порции
+        ready = ready_thumbnails(
+            [row['image'] for row in rows if row['image']], 'card'
+        )
+        for row in rows:
+            row['ready_thumbnail'] = ready.get(row['image'])
+    return [
+        {field: FIELDS[field][1](row, request) for field in fields}
+        for row in rows
+    ]
+
+
+def feed(request, source, *tags):
+    """Ответ API с порцией ленты source.
+
+    source - queryset постов или объект с методом
+    values_window(cursor, limit, columns); tags - теги кэша страниц ленты.
+    """
+    try:
+        fields = _fields(request)
+    except ValueError as error:
+        return _json({'detail': str(error)}, status=400)
+    columns = _columns(fields)
+    limit = settings.API_PAGE_SIZE
+    rows = _window(source, request, columns, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor_token(rows[-1]['pub_date'], rows[-1]['id'])
+    pagecache.depends(request, *tags, *_tags(rows))
+    response = _json({
+        'results': _documents(request, fields, rows),
+        'next': next_cursor,
+    })
+    cache_headers(request, response)
+    return response
+
+
+@pagecache.cache_anonymous_page
+def index(request):
+    return feed(request, Post.objects.all(), pagecache.FEED_INDEX)
+
+
+@pagecache.cache_anonymous_page
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return feed(
+        request, group.posts.all(), pagecache.group_feed_tag(group.pk)
+    )
+
+
+@pagecache.cache_anonymous_page
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return feed(
+        request, author.posts.all(), pagecache.author_feed_tag(author.pk)
+    )
+
+
+def follow_index(request):
+    # API не перенаправляет на страницу входа, а отвечает 401
+    if not request.user.is_authenticated:
+        return _json({'detail': 'Требуется вход на сайт'}, status=401)
+    return feed(request, follow_feed(request.user))
+
+
+def _newer(since, columns, using=None):
+    # от старых к новым: если новых постов больше порции, следующий запрос
+    # с since = latest заберет остальные
+    return list(
+        Post.objects.using(using).filter(pk__gt=since).values(*columns)
+        .order_by('pk')[:settings.API_PAGE_SIZE]
+    )
+
+
+@never_cache
+def new_posts(request):
+    # long poll: отвечает, как только появятся посты новее since, или
+    # через timeout секунд (не больше LONGPOLL_TIMEOUT) с пустым списком;
+    # latest - id последнего отданного поста, который передать в since
+    # следующего запроса
+    try:
+        fields = _fields(request)
+        since = int(request.GET.get('since', 0))
+        timeout = min(
+            float(request.GET.get('timeout', settings.LONGPOLL_TIMEOUT)),
+            settings.LONGPOLL_TIMEOUT
+        )
+    except ValueError as error:
+        return _json({'detail': str(error)}, status=400)
+    columns = _columns(fields)
+    generation = notify.new_posts.generation
+    rows = _newer(since, columns)
+    if not rows and timeout > 0:
+        notify.new_posts.wait(generation, timeout)
+        # оповещение приходит после коммита в основную базу, реплика
+        # может его еще не получить
+        rows = _newer(since, columns, using=DEFAULT_DB_ALIAS)
+    return _json({
+        'results': _documents(request, fields, rows),
+        'latest': rows[-1]['id'] if rows else since,
+    })
@@ -15,5 +15,5 @@ class PostsConfig(AppConfig):
         # две строки ниже можно удалить вместе со второй строкой файла
         # ./yatube/posts/apps.py:10:9: F401 'posts.signals' imported but unused
         # ================== Приведите код в соответствие с PEP8 =============
-        request_finished.connect(posts.signals.post_save_image)
-        request_finished.disconnect(posts.signals.post_save_image)
+        request_finished.connect(posts.signals.discard_image)
+        request_finished.disconnect(posts.signals.discard_image)
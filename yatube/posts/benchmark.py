@@ -0,0 +1,397 @@
+# posts/benchmark.py
+"""Нагрузочные замеры страниц лент.
+
+Runner прогоняет запросы к страницам через тестовый клиент Django или
+напрямую через WSGI-обработчик (со всеми middleware, но без
+инструментирования шаблонов тестовым клиентом) и собирает время ответа
+и число SQL-запросов. Отчет - словарь, который сохраняется в JSON
+и сравнивается с отчетом прошлого прогона. hold_waiters замеряет, сколько
+ожидающих long-poll запросов держит один процесс, mixed_load - сколько
+чтений и записей в секунду выдерживает SQLite с профилем PRAGMA.
+"""
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.db.models import Max, Min
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.sqlite import apply_pragmas, backup, profile
+
+from . import notify
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+ENDPOINTS = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+# сколько разных постов, групп и пользователей участвуют в замере
+TARGETS = 100
+
+
+def percentile(values, percent):
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    index = max(0, int(round(percent / 100 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def sample(queryset, field, count, rng):
+    """count случайных значений field без ORDER BY RANDOM().
+
+    Берется случайная точка диапазона pk и первая строка за ней -
+    один проход по индексу pk на значение.
+    """
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return list()
+    values = list()
+    for _ in range(count):
+        point = rng.randint(bounds['low'], bounds['high'])
+        values.append(
+            queryset.filter(pk__gte=point).order_by('pk')
+            .values_list(field, flat=True).first()
+        )
+    return values
+
+
+class Runner:
+    """Прогон запросов к страницам лент.
+
+    via - 'client' (тестовый клиент) или 'wsgi'; pages - номера страниц
+    лент выбираются случайно от 1 до pages; cold - сбрасывать кэш перед
+    каждым запросом.
+    """
+
+    def __init__(self, via='client', pages=1, cold=False, seed=42):
+        self.via = via
+        self.pages = pages
+        self.cold = cold
+        self.random = random.Random(seed)
+        self.handler = WSGIHandler()
+        self.factory = RequestFactory()
+        self.clients = dict()
+
+    def client(self, user_id=None):
+        if user_id not in self.clients:
+            client = Client()
+            if user_id is not None:
+                client.force_login(User.objects.get(pk=user_id))
+            self.clients[user_id] = client
+        return self.clients[user_id]
+
+    def targets(self, endpoint):
+        """Пары (url, id пользователя или None) для запросов к endpoint."""
+        rng = self.random
+        if endpoint == 'index':
+            return [(reverse('posts:index'), None)]
+        if endpoint == 'group_list':
+            return [
+                (reverse('posts:group_list', kwargs={'slug': slug}), None)
+                for slug in sample(Group.objects, 'slug', TARGETS, rng)
+            ]
+        if endpoint == 'profile':
+            return [
+                (reverse('posts:profile', kwargs={'username': name}), None)
+                for name in sample(
+                    Post.objects, 'author__username', TARGETS, rng
+                )
+            ]
+        if endpoint == 'post_detail':
+            return [
+                (reverse('posts:post_detail', kwargs={'post_id': pk}), None)
+                for pk in sample(Post.objects, 'pk', TARGETS, rng)
+            ]
+        if endpoint == 'follow_index':
+            return [
+                (reverse('posts:follow_index'), user_id)
+                for user_id in sample(Follow.objects, 'user_id', TARGETS, rng)
+            ]
+        raise ValueError(f'Неизвестная страница {endpoint}')
+
+    def request(self, url, user_id):
+        """Один запрос: (статус, время в мс, число SQL-запросов)."""
+        params = dict()
+        if self.pages > 1:
+            params['page'] = self.random.randint(1, self.pages)
+        if self.cold:
+            cache.clear()
+        client = self.client(user_id)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            if self.via == 'wsgi':
+                status = self.wsgi_get(url, params, client)
+            else:
+                status = client.get(url, params).status_code
+            elapsed = (time.perf_counter() - started) * 1000
+        return status, elapsed, len(context.captured_queries)
+
+    def wsgi_get(self, url, params, client):
+        cookie = client.cookies.get(settings.SESSION_COOKIE_NAME)
+        extra = dict()
+        if cookie is not None:
+            extra['HTTP_COOKIE'] = f'{cookie.key}={cookie.value}'
+        environ = self.factory.get(url, params, **extra).environ
+        statuses = list()
+        response = self.handler(
+            environ, lambda status, headers: statuses.append(status)
+        )
+        try:
+            b''.join(response)
+        finally:
+            response.close()
+        return int(statuses[0].split()[0])
+
+    def run(self, endpoint, requests, warmup=0):
+        targets = self.targets(endpoint)
+        if not targets:
+            return None
+        for _ in range(warmup):
+            self.request(*self.random.choice(targets))
+        timings, queries, errors = list(), list(), 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            status, elapsed, count = self.request(
+                *self.random.choice(targets)
+            )
+            errors += status != 200
+            timings.append(elapsed)
+            queries.append(count)
+        total = time.perf_counter() - started
+        timings.sort()
+        return {
+            'requests': requests,
+            'errors': errors,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'max_ms': round(timings[-1], 2),
+            'queries': round(sum(queries) / len(queries), 2),
+            'throughput_rps': round(requests / total, 1),
+        }
+
+
+def _memory_kb():
+    # текущий размер резидентной памяти процесса; где нет /proc - пиковый
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def hold_waiters(count, timeout=30):
+    """Держит count long-poll запросов к api_new_posts в одном процессе.
+
+    Каждый запрос идет через WSGI-обработчик в своем потоке, как у
+    многопоточного сервера. Когда все встали в ожидание, они будятся
+    разом, как при публикации поста. Возвращает время, за которое запросы
+    встали в ожидание, прирост памяти на запрос и задержку от оповещения
+    до ответа.
+    """
+    handler = WSGIHandler()
+    since = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    environ = RequestFactory().get(
+        reverse('posts:api_new_posts'),
+        {'since': since, 'timeout': timeout, 'fields': 'id'}
+    ).environ
+    statuses, finished = list(), list()
+
+    def waiter():
+        try:
+            response = handler(
+                dict(environ),
+                lambda status, headers: statuses.append(status)
+            )
+            b''.join(response)
+            response.close()
+            finished.append(time.perf_counter())
+        finally:
+            connections.close_all()
+
+    memory = _memory_kb()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=waiter) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    while (notify.new_posts.waiting < count
+           and time.perf_counter() - started < timeout):
+        time.sleep(0.01)
+    parked = time.perf_counter() - started
+    waiting = notify.new_posts.waiting
+    memory = _memory_kb() - memory
+    woken = time.perf_counter()
+    notify.new_posts.notify()
+    for thread in threads:
+        thread.join()
+    latencies = sorted((moment - woken) * 1000 for moment in finished)
+    return {
+        'waiters': count,
+        'waiting': waiting,
+        'errors': sum(not status.startswith('200') for status in statuses)
+        + count - len(statuses),
+        'park_s': round(parked, 2),
+        'memory_kb_per_waiter': round(memory / count, 1),
+        'wake_p50_ms': round(percentile(latencies, 50), 2)
+        if latencies else None,
+        'wake_max_ms': round(latencies[-1], 2) if latencies else None,
+    }
+
+
+# чтение - первая страница главной с авторами, запись - комментарий
+# с пересчетом счетчика поста, как у add_comment
+READ_SQL = (
+    'SELECT p.id, p.text, p.pub_date, u.username FROM {post} p '
+    'JOIN {user} u ON u.id = p.author_id '
+    'ORDER BY p.pub_date DESC LIMIT 10 OFFSET ?'
+)
+WRITE_SQL = (
+    'INSERT INTO {comment} (post_id, author_id, text, pub_date, updated) '
+    'VALUES (?, ?, ?, ?, ?)',
+    'UPDATE {post} SET comments_count = comments_count + 1 WHERE id = ?',
+)
+
+
+def _copy_database(directory):
+    """Согласованная копия базы: сама база в режиме журнала отката."""
+    path = os.path.join(directory, 'db.sqlite3')
+    backup(connection, path)
+    target = sqlite3.connect(path)
+    target.execute('PRAGMA journal_mode = DELETE')
+    target.close()
+    return path
+
+
+def _sql(template):
+    return template.format(
+        post=Post._meta.db_table,
+        user=User._meta.db_table,
+        comment=Comment._meta.db_table,
+    )
+
+
+def _operation(db, kind, rng, posts, users):
+    if kind == 'read':
+        db.execute(_sql(READ_SQL), [rng.randint(0, 5)]).fetchall()
+        return
+    post = rng.choice(posts)
+    now = timezone.now()
+    db.execute('BEGIN IMMEDIATE')
+    db.execute(_sql(WRITE_SQL[0]), [
+        post, rng.choice(users), 'Комментарий', now, now
+    ])
+    db.execute(_sql(WRITE_SQL[1]), [post])
+    db.execute('COMMIT')
+
+
+def _load(path, pragmas, deadline, rng, write_ratio, posts, users,
+          timings, errors):
+    """Поток смешанной нагрузки со своим соединением с базой."""
+    db = sqlite3.connect(path, isolation_level=None)
+    apply_pragmas(db.cursor(), pragmas)
+    while time.perf_counter() < deadline:
+        kind = 'write' if rng.random() < write_ratio else 'read'
+        started = time.perf_counter()
+        try:
+            _operation(db, kind, rng, posts, users)
+        except sqlite3.OperationalError:
+            errors.append(kind)
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            continue
+        timings[kind].append((time.perf_counter() - started) * 1000)
+    db.close()
+
+
+def mixed_load(profile_name, threads=8, seconds=5, write_ratio=0.1,
+               seed=42):
+    """Смешанная нагрузка на копию базы с PRAGMA профиля profile_name.
+
+    threads потоков в течение seconds секунд читают первую страницу
+    главной и с вероятностью write_ratio пишут комментарий, каждый через
+    свое соединение, как потоки обработчика. Возвращает число операций в
+    секунду, p95 задержки и ошибки «database is locked».
+    """
+    posts = list(Post.objects.values_list('pk', flat=True)[:1000])
+    users = list(User.objects.values_list('pk', flat=True)[:1000])
+    if not posts or not users:
+        return None
+    timings = {'read': list(), 'write': list()}
+    errors = list()
+    directory = tempfile.mkdtemp()
+    try:
+        path = _copy_database(directory)
+        deadline = time.perf_counter() + seconds
+        workers = [
+            threading.Thread(target=_load, args=(
+                path, profile(profile_name), deadline,
+                random.Random(seed + number), write_ratio, posts, users,
+                timings, errors
+            ))
+            for number in range(threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    result = {'profile': profile_name, 'threads': threads}
+    for kind, values in timings.items():
+        values.sort()
+        result[f'{kind}s_per_s'] = round(len(values) / seconds, 1)
+        result[f'{kind}_p95_ms'] = (
+            round(percentile(values, 95), 2) if values else None
+        )
+        result[f'{kind}_errors'] = errors.count(kind)
+    return result
+
+
+def dataset():
+    """Размер набора данных, на котором шел замер."""
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def report(results, **options):
+    return {
+        'started': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'options': options,
+        'dataset': dataset(),
+        'endpoints': results,
+    }
+
+
+def compare(current, previous):
+    """Строки сравнения с прошлым отчетом: изменение p50, p95 и запросов."""
+    lines = list()
+    for endpoint, result in current['endpoints'].items():
+        old = previous.get('endpoints', {}).get(endpoint)
+        if not result or not old:
+            continue
+        changes = list()
+        for key in ('p50_ms', 'p95_ms', 'queries'):
+            if old[key]:
+                delta = (result[key] - old[key]) / old[key] * 100
+                changes.append(f'{key} {old[key]} -> {result[key]} '
+                               f'({delta:+.0f}%)')
+        lines.append(f'{endpoint}: ' + ', '.join(changes))
+    return lines
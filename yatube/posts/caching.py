@@ -0,0 +1,216 @@
+# posts/caching.py
+"""Кэш приложения posts.
+
+Кроме поколения кэша главной здесь обертка над общим кэшем (см. CACHES
+в настройках), через которую posts кладет вычисляемые значения:
+
+- remember() пересчитывает значение одним процессом: остальные ждут
+  его (dogpile-блокировка на cache.add, а у файлового кэша, где add не
+  атомарен, - файлом, созданным с O_EXCL) или отдают устаревшее
+  значение, пока оно пересчитывается (stale-while-revalidate);
+- значение пересчитывается немного раньше срока со случайным упреждением,
+  пропорциональным времени вычисления (XFetch), чтобы горячие ключи не
+  истекали у всех процессов разом.
+
+Значения хранятся в конверте (значение, срок, время вычисления), а в
+кэше живут еще CACHE_STALE_TIMEOUT секунд после срока.
+"""
+import hashlib
+import math
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager, suppress
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+# поколение кэша главной страницы: входит в ключ каждого фрагмента,
+# смена поколения разом делает недоступными все закэшированные страницы
+INDEX_VERSION_KEY = 'posts:index_page:version'
+
+
+def index_cache_version():
+    """Текущее поколение кэша главной страницы."""
+    version = cache.get(INDEX_VERSION_KEY)
+    if version is None:
+        # ключ вытеснен или еще не создан: время в наносекундах не совпадет
+        # ни с одним из прежних поколений
+        version = time.time_ns()
+        if not cache.add(INDEX_VERSION_KEY, version, None):
+            version = cache.get(INDEX_VERSION_KEY, version)
+    return version
+
+
+def invalidate_index_cache():
+    """Сбрасывает кэш всех страниц главной ленты."""
+    cache.set(INDEX_VERSION_KEY, time.time_ns(), None)
+
+
+def page_cache_key(page_obj):
+    """Часть ключа кэша, различающая страницы одной ленты."""
+    cursor = getattr(page_obj, 'cursor', None)
+    if getattr(page_obj, 'is_cursor', False):
+        if cursor is None:
+            return 'cursor'
+        direction, pub_date, pk = cursor
+        return f'{direction}:{pub_date.timestamp()}:{pk}'
+    return page_obj.number
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _lock_file(key):
+    """Файл блокировки key для файлового кэша, для остальных - None.
+
+    FileBasedCache.add проверяет ключ и записывает его двумя шагами, и
+    блокировку могут взять два процесса сразу; создание файла с O_EXCL
+    атомарно.
+    """
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        return None
+    digest = hashlib.md5(_lock_key(key).encode('utf-8')).hexdigest()
+    return os.path.join(backend._dir, f'{digest}.lock')
+
+
+def _file_locked(path):
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        return False
+    if age < settings.CACHE_LOCK_TIMEOUT:
+        return True
+    # срок блокировки истек: взявший ее процесс завис или упал
+    with suppress(FileNotFoundError):
+        os.remove(path)
+    return False
+
+
+def _acquire(key, token):
+    path = _lock_file(key)
+    if path is None:
+        return cache.add(
+            _lock_key(key), token, settings.CACHE_LOCK_TIMEOUT
+        )
+    if _file_locked(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as file:
+        file.write(token)
+    return True
+
+
+def _release(key, token):
+    # блокировку, истекшую и взятую другим процессом, не снимаем
+    path = _lock_file(key)
+    if path is None:
+        if cache.get(_lock_key(key)) == token:
+            cache.delete(_lock_key(key))
+        return
+    with suppress(FileNotFoundError):
+        with open(path) as file:
+            owner = file.read()
+        if owner == token:
+            os.remove(path)
+
+
+def _locked(key):
+    path = _lock_file(key)
+    if path is None:
+        return cache.get(_lock_key(key)) is not None
+    return _file_locked(path)
+
+
+@contextmanager
+def lock(key):
+    """Блокировка пересчета key; дает True, если взята этим процессом."""
+    token = uuid.uuid4().hex
+    acquired = _acquire(key, token)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _release(key, token)
+
+
+def peek(key):
+    """Значение key без учета срока или None."""
+    entry = cache.get(key)
+    return None if entry is None else entry[0]
+
+
+def store(key, value, timeout, delta=0.0):
+    """Кладет value в кэш на timeout секунд (None - бессрочно).
+
+    delta - сколько секунд значение вычислялось: чем дольше, тем раньше
+    его начнут пересчитывать.
+    """
+    if timeout is None:
+        cache.set(key, (value, None, delta), None)
+        return
+    expires = time.time() + timeout
+    cache.set(
+        key, (value, expires, delta), timeout + settings.CACHE_STALE_TIMEOUT
+    )
+
+
+def _fresh(entry):
+    value, expires, delta = entry
+    if expires is None:
+        return True
+    # XFetch: -log(random) > 0, в среднем упреждение - delta * beta
+    early = -delta * settings.CACHE_EARLY_EXPIRATION_BETA * math.log(
+        random.random() or 1e-12
+    )
+    return time.time() + early < expires
+
+
+def _compute(key, compute, timeout):
+    started = time.perf_counter()
+    value = compute()
+    store(key, value, timeout, time.perf_counter() - started)
+    return value
+
+
+def wait(key):
+    """Ждет, пока другой процесс, взявший lock(key), положит значение.
+
+    Возвращает то, что лежит в кэше под key, или None, если за
+    CACHE_LOCK_WAIT секунд значение не появилось.
+    """
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if not _locked(key):
+            break
+    return None
+
+
+def remember(key, compute, timeout):
+    """Значение key из кэша или compute(), пересчитанное одним процессом."""
+    entry = cache.get(key)
+    if entry is not None and _fresh(entry):
+        return entry[0]
+    with lock(key) as acquired:
+        if acquired:
+            return _compute(key, compute, timeout)
+    if entry is not None:
+        # пересчетом уже занят другой процесс: отдаем прежнее значение
+        return entry[0]
+    entry = wait(key)
+    if entry is not None:
+        return entry[0]
+    # пересчет не успел или упал - считаем сами
+    return _compute(key, compute, timeout)
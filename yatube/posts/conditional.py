@@ -0,0 +1,87 @@
+# posts/conditional.py
+"""Условные GET-запросы к страницам постов и лент.
+
+ETag страницы - хэш того, от чего зависит ее содержимое: id и даты
+изменения постов страницы (Post.updated меняется и при новых
+комментариях, и когда готова миниатюра), шапки профиля или группы,
+версий тегов кэша страниц, от которых она зависит, и пользователя, для
+которого страница собрана. Last-Modified - время последнего изменения
+этих тегов (pagecache.validators): даты изменения постов не растут,
+когда пост удаляют из ленты или переименовывают его автора. Если клиент
+или прокси прислали совпадающие валидаторы, view отвечает 304 без
+рендеринга шаблона.
+"""
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.shortcuts import render
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+
+
+def page_state(objects):
+    """Части ETag для списка постов или комментариев."""
+    return [(obj.pk, obj.updated.timestamp()) for obj in objects]
+
+
+def feed_state(page_obj):
+    """page_state страницы ленты вместе с ее навигацией."""
+    if getattr(page_obj, 'is_cursor', False):
+        navigation = (page_obj.next_cursor, page_obj.previous_cursor)
+    else:
+        navigation = (page_obj.number, page_obj.paginator.num_pages)
+    return navigation, page_state(page_obj)
+
+
+def cache_headers(request, response):
+    """Заголовки кэширования страницы.
+
+    Анонимные страницы может кэшировать обратный прокси, страницы
+    пользователя - только его браузер, и то каждый раз сверяя ETag.
+    """
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=0,
+            s_maxage=settings.PAGE_SHARED_MAX_AGE
+        )
+    patch_vary_headers(response, ('Cookie',))
+
+
+def conditional_response(request, parts, last_modified, respond):
+    """Ответ respond(), если страница изменилась, иначе 304.
+
+    parts - значения, от которых зависит содержимое страницы, кроме
+    пользователя (он добавляется сам); last_modified - datetime.
+    """
+    digest = hashlib.md5(
+        repr((request.user.pk, parts)).encode('utf-8')
+    ).hexdigest()
+    etag = quote_etag(digest)
+    # заголовок Last-Modified точен до секунды
+    timestamp = (
+        timegm(last_modified.utctimetuple()) if last_modified else None
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    cache_headers(request, response)
+    return response
+
+
+def conditional_render(request, template_name, context, parts,
+                       last_modified=None):
+    """render(), который отвечает 304, если страница не изменилась."""
+    return conditional_response(
+        request, parts, last_modified,
+        lambda: render(request, template_name, context)
+    )
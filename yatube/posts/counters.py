@@ -0,0 +1,111 @@
+# posts/counters.py
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import pagecache
+from .models import AuthorCounters, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def _count_subquery(queryset, field):
+    """Коррелированный подзапрос COUNT(*) строк queryset по полю field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+# что пересчитывать: модель -> {поле счетчика: (queryset, поле связи)}
+RECONCILE = {
+    Post: {
+        'comments_count': (Comment.objects.all(), 'post'),
+    },
+    Group: {
+        'posts_count': (Post.objects.all(), 'group'),
+    },
+    AuthorCounters: {
+        'posts_count': (Post.objects.all(), 'author'),
+        'followers_count': (Follow.objects.all(), 'author'),
+        'following_count': (Follow.objects.all(), 'user'),
+    },
+}
+
+
+def change_author(user_id, **deltas):
+    """Атомарно сдвигает счетчики пользователя.
+
+    change_author(user_id, posts_count=1, ...)
+    """
+    updated = AuthorCounters.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if updated or min(deltas.values()) < 0:
+        # уменьшение без строки счетчиков бывает при каскадном удалении
+        # пользователя - воскрешать строку тогда нельзя
+        return
+    if User.objects.filter(pk=user_id).exists():
+        # строки счетчиков еще нет - создаем ее сразу с точными значениями
+        reconcile(AuthorCounters, users=[user_id])
+
+
+def change_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F('posts_count') + delta
+        )
+
+
+def change_post(post_id, delta):
+    # число комментариев видно на карточке поста: это изменение поста
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta,
+        updated=timezone.now()
+    )
+
+
+def reconcile(model, users=None):
+    """Пересчитывает счетчики model одним UPDATE на каждое поле.
+
+    Для AuthorCounters сначала создаются недостающие строки (для users или
+    всех пользователей). Возвращает число исправленных значений.
+    """
+    queryset = model.objects.all()
+    if model is AuthorCounters:
+        owners = User.objects.all()
+        if users is not None:
+            owners = owners.filter(pk__in=users)
+            queryset = queryset.filter(user__in=users)
+        AuthorCounters.objects.bulk_create(
+            (AuthorCounters(user_id=user_id)
+             for user_id in owners.values_list('pk', flat=True)
+             .exclude(counters__isnull=False)),
+            batch_size=500,
+            ignore_conflicts=True
+        )
+    fixed = 0
+    for field, (related, link) in RECONCILE[model].items():
+        actual = _count_subquery(related, link)
+        drifted = queryset.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        )
+        changes = {field: actual}
+        if model is Post:
+            # как и в change_post: поправленный счетчик меняет карточку
+            changes['updated'] = timezone.now()
+        fixed += model.objects.filter(
+            pk__in=drifted.values('pk')
+        ).update(**changes)
+    if fixed:
+        # какие страницы показывали неверные счетчики, не отследить
+        pagecache.invalidate_all()
+    return fixed
@@ -0,0 +1,206 @@
+# posts/feeds.py
+"""RSS- и Atom-ленты главной, групп и авторов.
+
+Лента собирается из тех же постов, что и первая страница ленты на сайте,
+и отдается так же: анонимным читателям - из кэша страниц, пока не
+изменится ни один ее пост, группа или автор, а с совпадающими ETag или
+Last-Modified - ответом 304 без сборки XML. Программы чтения лент
+опрашивают их каждые несколько минут, и почти все опросы заканчиваются
+на 304 или кэше.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from . import pagecache
+from .conditional import conditional_response, page_state
+from .models import Group, Post
+
+User = get_user_model()
+
+# владелец ленты (группа, автор или None для главной), ее посты и теги
+# кэша страниц, от которых она зависит
+Source = namedtuple('Source', 'owner posts tags')
+
+
+class PostsFeed(Feed):
+    """Общая часть лент постов: элементы, кэш и условные запросы.
+
+    posts - queryset постов, из которых собирается лента; у лент группы
+    и автора он сужается до постов владельца (поле owner_field).
+    """
+
+    owner_field = None
+
+    def __init__(self, posts):
+        self.posts = posts
+
+    def get_owner(self, request, *args, **kwargs):
+        """Владелец ленты по аргументам URL; у главной его нет."""
+        return None
+
+    def owner_tags(self, owner):
+        """Теги кэша страниц шапки и списка постов ленты."""
+        return (pagecache.FEED_INDEX,)
+
+    def get_object(self, request, *args, **kwargs):
+        owner = self.get_owner(request, *args, **kwargs)
+        posts = self.posts
+        if owner is not None:
+            posts = posts.filter(**{self.owner_field: owner})
+        posts = list(
+            posts.select_related('author', 'group')[:settings.FEED_ITEMS]
+        )
+        tags = (*self.owner_tags(owner), *pagecache.posts_tags(posts))
+        pagecache.depends(request, *tags)
+        return Source(owner, posts, tags)
+
+    def owner_state(self, owner):
+        """Части ETag от шапки ленты."""
+        return ()
+
+    def respond(self, source, request):
+        feedgen = self.get_feed(source, request)
+        response = HttpResponse(content_type=feedgen.content_type)
+        feedgen.write(response, 'utf-8')
+        return response
+
+    def __call__(self, request, *args, **kwargs):
+        source = self.get_object(request, *args, **kwargs)
+        versions, last_modified = pagecache.validators(request, *source.tags)
+        return conditional_response(
+            request,
+            (
+                type(self).__name__,
+                self.owner_state(source.owner),
+                page_state(source.posts),
+                versions,
+            ),
+            last_modified,
+            lambda: self.respond(source, request)
+        )
+
+    def items(self, source):
+        return source.posts
+
+    def item_title(self, post):
+        return Truncator(post.text).words(10)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated
+
+    def item_categories(self, post):
+        return (post.group.title,) if post.group else ()
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupFeed(PostsFeed):
+    owner_field = 'group'
+
+    def get_owner(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def owner_tags(self, group):
+        return (
+            pagecache.group_tag(group.pk),
+            pagecache.group_feed_tag(group.pk)
+        )
+
+    def owner_state(self, group):
+        return group.title, group.description
+
+    def title(self, source):
+        return f'Yatube: {source.owner.title}'
+
+    def description(self, source):
+        return source.owner.description
+
+    def link(self, source):
+        return reverse('posts:group_list', kwargs={'slug': source.owner.slug})
+
+
+class AuthorFeed(PostsFeed):
+    owner_field = 'author'
+
+    def get_owner(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def owner_tags(self, author):
+        return (
+            pagecache.user_tag(author.pk),
+            pagecache.author_feed_tag(author.pk)
+        )
+
+    def owner_state(self, author):
+        return author.get_full_name()
+
+    def title(self, source):
+        author = source.owner
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, source):
+        return f'Записи пользователя {source.owner.username}'
+
+    def link(self, source):
+        return reverse(
+            'posts:profile', kwargs={'username': source.owner.username}
+        )
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, source):
+        return self._get_dynamic_attr('description', source)
+
+
+class IndexAtomFeed(AtomMixin, IndexFeed):
+    pass
+
+
+class GroupAtomFeed(AtomMixin, GroupFeed):
+    pass
+
+
+class AuthorAtomFeed(AtomMixin, AuthorFeed):
+    pass
+
+
+index_rss = pagecache.cache_anonymous_page(IndexFeed(Post.objects.all()))
+index_atom = pagecache.cache_anonymous_page(
+    IndexAtomFeed(Post.objects.all())
+)
+group_rss = pagecache.cache_anonymous_page(GroupFeed(Post.objects.all()))
+group_atom = pagecache.cache_anonymous_page(
+    GroupAtomFeed(Post.objects.all())
+)
+author_rss = pagecache.cache_anonymous_page(AuthorFeed(Post.objects.all()))
+author_atom = pagecache.cache_anonymous_page(
+    AuthorAtomFeed(Post.objects.all())
+)
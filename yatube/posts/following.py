@@ -0,0 +1,90 @@
+# posts/following.py
+"""Кэш множества авторов, на которых подписан пользователь.
+
+Множество хранится в кэше как отсортированный array('I') id авторов
+(4 байта на подписку) и проверяется двоичным поиском. Ключ массива
+содержит поколение пользователя: после коммита подписки или отписки
+сигналы меняют поколение, и массив загружается заново при следующей
+проверке. Массив, прочитанный из базы до коммита, уходит под ключ
+прежнего поколения и больше не читается. В пределах запроса массив
+запоминается на объекте пользователя, так что проверки "подписан ли я
+на X" обходятся без запросов к базе.
+"""
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caching
+from .models import Follow
+
+
+def _version_key(user_id):
+    return f'posts:following:{user_id}:version'
+
+
+def _new_version():
+    # время в наносекундах не совпадет ни с одним из прежних поколений
+    return time.time_ns()
+
+
+def cache_key(user_id):
+    """Ключ массива user_id в текущем поколении."""
+    version_key = _version_key(user_id)
+    version = cache.get(version_key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(version_key, version, None):
+            version = cache.get(version_key, version)
+    return f'posts:following:{user_id}:{version}'
+
+
+def _load(user_id):
+    return array('I', Follow.objects.filter(
+        user_id=user_id
+    ).order_by('author_id').values_list('author_id', flat=True))
+
+
+def followed_ids(user):
+    """Отсортированный массив id авторов, на которых подписан user."""
+    if not user.is_authenticated:
+        return array('I')
+    ids = getattr(user, '_followed_ids', None)
+    if ids is None:
+        ids = caching.remember(
+            cache_key(user.pk), lambda: _load(user.pk),
+            settings.FOLLOWING_CACHE_TIMEOUT
+        )
+        user._followed_ids = ids
+    return ids
+
+
+def contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user, author_id):
+    return contains(followed_ids(user), author_id)
+
+
+def forget(user_id):
+    """Меняет поколение множества user_id после коммита подписки или отписки.
+
+    Правка закэшированного массива на месте теряла бы одновременные
+    изменения, а при откате оставила бы в кэше несуществующую подписку.
+    Простое удаление ключа не спасает от проверки, которая прочитала базу
+    до коммита и запишет старый массив уже после него.
+    """
+    transaction.on_commit(lambda: invalidate([user_id]))
+
+
+def invalidate(user_ids):
+    """Сбрасывает множества, измененные в обход сигналов (bulk_create)."""
+    cache.set_many(
+        {_version_key(user_id): _new_version() for user_id in user_ids},
+        None
+    )
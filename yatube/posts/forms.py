@@ -1,6 +1,9 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.utils.datastructures import MultiValueDict
 from django.utils.translation import gettext_lazy as _
 
+from .images import ingest
 from .models import Comment, Post
 
 
@@ -19,6 +22,22 @@ class PostForm(forms.ModelForm):
             'image': _('Картинка поста')
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # новая загрузка проходит прием: проверку размеров по заголовку
+        # и уменьшение слишком больших оригиналов
+        self.image_stats = None
+        if isinstance(image, UploadedFile):
+            ingested, self.image_stats = ingest(image)
+            replaced = ingested is not image
+            if replaced and isinstance(self.files, MultiValueDict):
+                # уменьшенная копия заменяет загрузку в request.FILES:
+                # Django закроет ее вместе с запросом, уже после
+                # сохранения поста
+                self.files[self.add_prefix('image')] = ingested
+            image = ingested
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
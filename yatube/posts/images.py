@@ -0,0 +1,121 @@
+# posts/images.py
+import logging
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # нет на Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# форматы, которые draft() декодирует сразу в уменьшенном масштабе
+DRAFT_FORMATS = {'JPEG'}
+
+# метрики приема одной картинки: размеры до и после, время в мс,
+# прирост пикового RSS процесса в КиБ и объем декодированного растра
+IngestStats = namedtuple(
+    'IngestStats',
+    'name width height new_width new_height elapsed_ms rss_kib decoded_bytes'
+)
+
+
+def _max_rss():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def header(upload):
+    """Формат и размеры картинки из заголовка файла, без декодирования."""
+    upload.seek(0)
+    with Image.open(upload) as image:
+        return image.format, image.size
+
+
+def check_size(width, height, image_format):
+    limit = settings.POST_IMAGE_MAX_PIXELS
+    if image_format not in DRAFT_FORMATS:
+        limit = min(limit, settings.POST_IMAGE_MAX_FULL_DECODE_PIXELS)
+    if width * height > limit:
+        raise ValidationError(
+            'Слишком большая картинка: %(width)sx%(height)s точек',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+
+
+def downscale(upload, max_side):
+    """Уменьшает картинку до max_side по большей стороне.
+
+    draft() заставляет JPEG декодироваться сразу в уменьшенном масштабе
+    (1/2 - 1/8), thumbnail() дальше уменьшает поэтапно, так что полный
+    растр оригинала в памяти не держится. Остальные форматы draft() не
+    уменьшает, их растр декодируется целиком, поэтому check_size
+    пропускает их только до POST_IMAGE_MAX_FULL_DECODE_PIXELS точек
+    (12 млн, до 48 МБ растра). Результат крупнее
+    FILE_UPLOAD_MAX_MEMORY_SIZE пишется во временный файл без имени на
+    диске: хранилище копирует его, а не переносит, и файл исчезает сам
+    при закрытии. Исходная загрузка закрывается.
+    Возвращает новый файл и число байт декодированного растра.
+    """
+    upload.seek(0)
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    with Image.open(upload) as image:
+        image_format = image.format
+        image.draft(image.mode, (max_side, max_side))
+        # после draft() size - это размер, в котором растр будет декодирован
+        decoded = image.width * image.height * len(image.getbands())
+        image.thumbnail((max_side, max_side))
+        options = {'quality': 90} if image_format == 'JPEG' else {}
+        image.save(buffer, format=image_format, **options)
+    result = UploadedFile(
+        buffer, upload.name, upload.content_type, buffer.tell()
+    )
+    result.seek(0)
+    upload.close()
+    return result, decoded
+
+
+def ingest(upload):
+    """Прием загруженной картинки поста.
+
+    Проверяет размеры по заголовку до полного декодирования (для форматов
+    без draft() предел ниже), слишком большие по стороне картинки
+    уменьшает. Возвращает (файл, IngestStats).
+    """
+    started = time.perf_counter()
+    rss = _max_rss()
+    image_format, (width, height) = header(upload)
+    check_size(width, height, image_format)
+    new_width, new_height, decoded = width, height, 0
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    if max(width, height) > max_side:
+        upload, decoded = downscale(upload, max_side)
+        new_width, new_height = header(upload)[1]
+    upload.seek(0)
+    stats = IngestStats(
+        name=os.path.basename(upload.name),
+        width=width,
+        height=height,
+        new_width=new_width,
+        new_height=new_height,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+        rss_kib=_max_rss() - rss,
+        decoded_bytes=decoded,
+    )
+    logger.info(
+        'image ingest name=%s size=%sx%s stored=%sx%s elapsed_ms=%.1f '
+        'peak_rss_growth_kib=%s decoded_bytes=%s', *stats
+    )
+    return upload, stats
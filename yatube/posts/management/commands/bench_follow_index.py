@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.benchmark import percentile
+from posts.timeline import CELEBRITIES_KEY
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время и число SQL-запросов страницы follow_index '
+            'для выбранного пользователя')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Чью ленту подписок открывать')
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Сколько запросов выполнить (по умолчанию 100)'
+        )
+        parser.add_argument(
+            '--page', default=None,
+            help='Номер страницы ленты (по умолчанию первая)'
+        )
+        parser.add_argument(
+            '--threshold', type=int, default=None,
+            help=('Порог подписчиков для подмешивания постов при чтении '
+                  '(по умолчанию TIMELINE_FANOUT_THRESHOLD)')
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        overrides = dict()
+        if options['threshold'] is not None:
+            overrides['TIMELINE_FANOUT_THRESHOLD'] = options['threshold']
+        params = {'page': options['page']} if options['page'] else {}
+        url = reverse('posts:follow_index')
+        with override_settings(**overrides):
+            cache.delete(CELEBRITIES_KEY)
+            client = Client()
+            client.force_login(user)
+            timings, queries = list(), list()
+            for _ in range(options['requests']):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = client.get(url, params)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{url} вернул статус {response.status_code}'
+                    )
+                queries.append(len(context.captured_queries))
+            cache.delete(CELEBRITIES_KEY)
+        timings.sort()
+        self.stdout.write(
+            f'{url} x{len(timings)}: '
+            f'p50 {percentile(timings, 50):.1f} мс, '
+            f'p95 {percentile(timings, 95):.1f} мс, '
+            f'max {timings[-1]:.1f} мс, '
+            f'SQL-запросов на запрос {sum(queries) / len(queries):.1f}'
+        )
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import hold_waiters, report
+
+
+class Command(BaseCommand):
+    help = ('Замеряет, сколько ожидающих long-poll запросов за новыми '
+            'постами держит один процесс и как быстро они просыпаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'waiters', nargs='*', type=int, default=[10, 100, 500, 1000],
+            help='Число одновременно ожидающих запросов (по умолчанию '
+                 '10 100 500 1000)'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='Сколько секунд ждать, пока все запросы встанут в ожидание'
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Куда сохранить отчет в JSON'
+        )
+
+    def handle(self, *args, **options):
+        results = dict()
+        for count in options['waiters']:
+            result = hold_waiters(count, options['timeout'])
+            results[str(count)] = result
+            self.stdout.write(
+                f'{count}: в ожидании {result["waiting"]} за '
+                f'{result["park_s"]} с, {result["memory_kb_per_waiter"]} КБ '
+                f'на запрос, пробуждение p50 {result["wake_p50_ms"]} мс, '
+                f'max {result["wake_max_ms"]} мс, '
+                f'ошибок {result["errors"]}'
+            )
+        if options['output']:
+            current = report(results, timeout=options['timeout'])
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(current, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,69 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.benchmark import mixed_load, report
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite при смешанных '
+            'чтениях и записях с разными профилями PRAGMA')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profiles', nargs='*', default=['default', 'production'],
+            help='Профили из SQLITE_PROFILES (по умолчанию default и '
+                 'production)'
+        )
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--seconds', type=float, default=5,
+            help='Длительность прогона каждого профиля'
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help='Доля записей среди операций (по умолчанию 0.1)'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output', default=None,
+            help='Куда сохранить отчет в JSON'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер только для SQLite')
+        unknown = set(options['profiles']) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные профили: {", ".join(sorted(unknown))}'
+            )
+        results = dict()
+        for name in options['profiles']:
+            result = mixed_load(
+                name, options['threads'], options['seconds'],
+                options['write_ratio'], options['seed']
+            )
+            results[name] = result
+            if result is None:
+                self.stdout.write(f'{name}: нет данных для замера')
+                continue
+            self.stdout.write(
+                f'{name}: чтений {result["reads_per_s"]}/с '
+                f'(p95 {result["read_p95_ms"]} мс, '
+                f'ошибок {result["read_errors"]}), '
+                f'записей {result["writes_per_s"]}/с '
+                f'(p95 {result["write_p95_ms"]} мс, '
+                f'ошибок {result["write_errors"]})'
+            )
+        if options['output']:
+            current = report(
+                results,
+                **{key: options[key] for key in (
+                    'threads', 'seconds', 'write_ratio', 'seed'
+                )}
+            )
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(current, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,93 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import ENDPOINTS, Runner, compare, report
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку (p50/p95/p99), число SQL-запросов и '
+            'пропускную способность страниц лент')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'endpoints', nargs='*',
+            help=f'Какие страницы замерять: {", ".join(ENDPOINTS)} '
+                 f'(по умолчанию все)'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на страницу (по умолчанию 200)'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=10,
+            help='Прогревочных запросов, не входящих в замер'
+        )
+        parser.add_argument(
+            '--pages', type=int, default=1,
+            help='Номера страниц лент выбираются от 1 до pages'
+        )
+        parser.add_argument(
+            '--via', choices=('client', 'wsgi'), default='client',
+            help='Тестовый клиент Django или WSGI-обработчик'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Сбрасывать кэш перед каждым запросом'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--output', default=None,
+            help='Куда сохранить отчет в JSON'
+        )
+        parser.add_argument(
+            '--compare', default=None,
+            help='Отчет прошлого прогона для сравнения'
+        )
+
+    def handle(self, *args, **options):
+        endpoints = options['endpoints'] or ENDPOINTS
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные страницы: {", ".join(sorted(unknown))}'
+            )
+        runner = Runner(
+            via=options['via'],
+            pages=options['pages'],
+            cold=options['cold'],
+            seed=options['seed'],
+        )
+        results = dict()
+        for endpoint in endpoints:
+            result = runner.run(
+                endpoint, options['requests'], options['warmup']
+            )
+            results[endpoint] = result
+            if result is None:
+                self.stdout.write(f'{endpoint}: нет данных для замера')
+                continue
+            self.stdout.write(
+                f'{endpoint}: p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                f'запросов {result["queries"]}, '
+                f'{result["throughput_rps"]} запр/с, '
+                f'ошибок {result["errors"]}'
+            )
+        current = report(
+            results,
+            **{key: options[key] for key in (
+                'requests', 'warmup', 'pages', 'via', 'cold', 'seed'
+            )}
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(current, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    previous = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Не удалось прочитать отчет: {error}')
+            for line in compare(current, previous):
+                self.stdout.write(line)
@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import export_records, write_csv, write_jsonl
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки потоком '
+            'в JSON Lines или CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help=('Файл JSON Lines ("-" - стандартный вывод) или каталог '
+                  'для CSV')
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl',
+            help='Формат выгрузки (по умолчанию jsonl)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.perf_counter()
+        if options['format'] == 'csv':
+            count = write_csv(export_records(), path)
+        elif path == '-':
+            count = write_jsonl(export_records(), sys.stdout)
+        else:
+            with open(path, 'w', encoding='utf-8') as stream:
+                count = write_jsonl(export_records(), stream)
+        elapsed = time.perf_counter() - started
+        # отчет - в stderr, чтобы не смешиваться с выгрузкой в stdout
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено записей: {count} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-6):.0f} записей/с)'
+        ))
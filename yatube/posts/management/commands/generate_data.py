@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.synthetic import SyntheticData
+from posts.transfer import MODELS, Importer
+
+
+class Command(BaseCommand):
+    help = ('Генерирует воспроизводимый синтетический набор пользователей, '
+            'групп, постов, комментариев и подписок для нагрузочных замеров')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Число пользователей (по умолчанию 1000)'
+        )
+        parser.add_argument(
+            '--posts', type=int, default=100000,
+            help='Число постов (по умолчанию 100000)'
+        )
+        parser.add_argument(
+            '--groups', type=int, default=50,
+            help='Число групп (по умолчанию 50)'
+        )
+        parser.add_argument(
+            '--comments', type=float, default=2.0,
+            help='Среднее число комментариев на пост (по умолчанию 2)'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Медиана числа подписок пользователя (по умолчанию 20)'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.1,
+            help='Доля постов с картинкой (по умолчанию 0.1)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Зерно генератора: одно зерно - один и тот же набор'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        data = SyntheticData(
+            users=options['users'],
+            posts=options['posts'],
+            groups=options['groups'],
+            comments=options['comments'],
+            follows=options['follows'],
+            images=options['images'],
+            seed=options['seed'],
+        )
+        started = time.perf_counter()
+        if options['images']:
+            data.save_images()
+        importer = Importer(
+            batch_size=options['batch_size'], create_users=True
+        )
+        importer.run(data.records())
+        elapsed = time.perf_counter() - started
+        for model in MODELS:
+            self.stdout.write(f'{model}: {importer.imported[model]}')
+        total = sum(importer.imported.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} записей/с)'
+        ))
@@ -0,0 +1,79 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import MODELS, Importer, read_csv, read_jsonl
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии и подписки из выгрузки '
+            'export_content пачками через bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help=('Файл JSON Lines ("-" - стандартный ввод) или каталог '
+                  'с CSV')
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'), default='jsonl',
+            help='Формат выгрузки (по умолчанию jsonl)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько записей вставлять одним запросом'
+        )
+        parser.add_argument(
+            '--media-dir', default=None,
+            help=('MEDIA_ROOT исходного окружения, откуда копировать '
+                  'картинки постов')
+        )
+        parser.add_argument(
+            '--link', action='store_true',
+            help='Не копировать картинки, а создавать жесткие ссылки'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число потоков копирования картинок'
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать отсутствующих пользователей без пароля'
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(
+            batch_size=options['batch_size'],
+            media_dir=options['media_dir'],
+            link=options['link'],
+            workers=options['workers'],
+            create_users=options['create_users'],
+        )
+        path = options['path']
+        started = time.perf_counter()
+        if options['format'] == 'csv':
+            importer.run(read_csv(path))
+        elif path == '-':
+            importer.run(read_jsonl(sys.stdin))
+        else:
+            with open(path, encoding='utf-8') as stream:
+                importer.run(read_jsonl(stream))
+        elapsed = time.perf_counter() - started
+        for model in MODELS:
+            imported = importer.imported[model]
+            seconds = importer.elapsed[model]
+            self.stdout.write(
+                f'{model}: загружено {imported}, '
+                f'пропущено {importer.skipped[model]}, '
+                f'{imported / max(seconds, 1e-6):.0f} строк/с'
+            )
+        if importer.skipped['image']:
+            self.stdout.write(
+                f'картинок не найдено: {importer.skipped["image"]}'
+            )
+        total = sum(importer.imported.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} записей/с)'
+        ))
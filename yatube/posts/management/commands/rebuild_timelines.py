@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает материализованные ленты подписок по таблице Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Имена пользователей; по умолчанию перестраиваются все ленты'
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        rebuilt = rebuild_timelines(users)
+        self.stdout.write(
+            self.style.SUCCESS(f'Перестроено лент подписок: {rebuilt}')
+        )
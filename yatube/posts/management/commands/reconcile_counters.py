@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import RECONCILE, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счетчики постов, комментариев '
+            'и подписок и исправляет расхождения')
+
+    def handle(self, *args, **options):
+        for model in RECONCILE:
+            fixed = reconcile(model)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: исправлено {fixed}'
+            )
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
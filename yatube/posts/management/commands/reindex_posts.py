@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.search import get_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько постов индексировать за раз'
+        )
+
+    def handle(self, *args, **options):
+        index = get_index()
+        batch_size = options['batch_size']
+        indexed = 0
+        with transaction.atomic():
+            index.clear()
+            last_pk = 0
+            while True:
+                batch = list(
+                    Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                    .values_list('pk', 'text')[:batch_size]
+                )
+                if not batch:
+                    break
+                index.add(batch)
+                indexed += len(batch)
+                last_pk = batch[-1][0]
+        index.optimize()
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(index).__name__}: проиндексировано постов {indexed}'
+        ))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.sqlite import maintain
+
+
+class Command(BaseCommand):
+    help = ('Обслуживает базу SQLite: ANALYZE, возврат свободных страниц '
+            '(incremental vacuum) и контрольная точка WAL. Запускайте по '
+            'cron или с --interval')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы из DATABASES'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые interval секунд (по умолчанию - '
+                 'один раз)'
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='Сколько свободных страниц вернуть за раз (0 - все)'
+        )
+        parser.add_argument(
+            '--full-vacuum', action='store_true',
+            help='Перестроить базу целиком (один раз после включения '
+                 'auto_vacuum = INCREMENTAL; блокирует запись)'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда обслуживает только SQLite')
+        while True:
+            result = maintain(
+                connection, options['vacuum_pages'], options['full_vacuum']
+            )
+            checkpoint = result['checkpoint']
+            self.stdout.write(
+                f'journal_mode {result["journal_mode"]}, '
+                f'auto_vacuum {result["auto_vacuum"]}, '
+                f'освобождено страниц {result["freed_pages"]}'
+                + (f', WAL: перенесено {checkpoint["checkpointed"]} из '
+                   f'{checkpoint["log"]} страниц'
+                   + (' (база занята)' if checkpoint['busy'] else '')
+                   if checkpoint else '')
+            )
+            if not options['interval']:
+                break
+            # полный VACUUM нужен только один раз
+            options['full_vacuum'] = False
+            connection.close()
+            time.sleep(options['interval'])
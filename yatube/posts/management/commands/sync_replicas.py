@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.sqlite import backup
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики из DATABASE_REPLICAS. '
+            'Запускайте по cron или с --interval')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые interval секунд (по умолчанию - '
+                 'один раз)'
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не заданы: укажите пути в YATUBE_DB_REPLICAS'
+            )
+        replicas = [connections[alias] for alias in settings.DATABASE_REPLICAS]
+        if any(connection.vendor != 'sqlite'
+               for connection in (primary, *replicas)):
+            raise CommandError('Команда копирует только базы SQLite')
+        while True:
+            for replica in replicas:
+                started = time.perf_counter()
+                backup(primary, replica.settings_dict['NAME'])
+                self.stdout.write(
+                    f'{replica.alias}: скопирована за '
+                    f'{time.perf_counter() - started:.2f} с'
+                )
+            if not options['interval']:
+                break
+            primary.close()
+            time.sleep(options['interval'])
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:39
+
+import sqlite3
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fts5_supported():
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE test USING fts5(terms)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def create_fts_table(apps, schema_editor):
+    # основы слов постов; rowid - id поста
+    if schema_editor.connection.vendor == 'sqlite' and fts5_supported():
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_search USING fts5(terms)'
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('length', models.IntegerField(verbose_name='Число слов')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('frequency', models.IntegerField(verbose_name='Число вхождений')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='posts.SearchDocument', verbose_name='Документ')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'document'), name='unique search posting'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
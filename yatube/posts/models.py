@@ -9,6 +9,11 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.IntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['pk']
@@ -45,12 +50,45 @@ class Post(CreatedModel):
         blank=True
     )
 
+    comments_count = models.IntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+
     class Meta:
         ordering = ['-pub_date']
+        # индексы под выборки лент (см. posts/views.py); при равной дате
+        # SQLite упорядочивает строки индекса по rowid, то есть по pk, так что
+        # обратный проход по индексу сразу дает порядок (-pub_date, -pk)
+        # курсорной пагинации
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # группа на момент загрузки: по ней сигналы пересчитывают
+        # счетчики постов групп без повторного запроса к базе
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        # имя картинки на момент загрузки: старый файл удаляется после
+        # замены, тоже без повторного запроса
+        if 'image' in field_names:
+            instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -71,6 +109,15 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        ordering = ['pub_date']
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'],
+                name='comment_post_pub_date_idx'
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -94,3 +141,107 @@ class Follow(models.Model):
                 name='unique following'
             )
         ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), дата публикации
+    продублирована из поста, чтобы лента читалась одним проходом по индексу
+    (user, -pub_date, -post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Владелец ленты'
+    )
+
+    post = models.ForeignKey(
+        'Post',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique timeline entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+
+class AuthorCounters(models.Model):
+    """Денормализованные счетчики пользователя.
+
+    Обновляются сигналами через F()-выражения; расхождения исправляет
+    команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+
+    posts_count = models.IntegerField('Число постов', default=0)
+
+    # по числу подписчиков выбираются авторы для гибридной ленты подписок
+    followers_count = models.IntegerField(
+        'Число подписчиков',
+        default=0,
+        db_index=True
+    )
+
+    following_count = models.IntegerField('Число подписок', default=0)
+
+
+class SearchDocument(models.Model):
+    """Пост в табличном поисковом индексе (когда FTS5 недоступен).
+
+    Длина - число слов текста, она нужна для ранжирования BM25.
+    """
+    post = models.OneToOneField(
+        'Post',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name='Пост'
+    )
+
+    length = models.IntegerField('Число слов')
+
+
+class SearchPosting(models.Model):
+    """Вхождение основы слова в пост: строка инвертированного индекса."""
+    term = models.CharField('Основа слова', max_length=64)
+
+    document = models.ForeignKey(
+        'SearchDocument',
+        on_delete=models.CASCADE,
+        related_name='postings',
+        verbose_name='Документ'
+    )
+
+    frequency = models.IntegerField('Число вхождений')
+
+    class Meta:
+        # уникальность по (term, document) дает и индекс для поиска по term
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'document'],
+                name='unique search posting'
+            )
+        ]
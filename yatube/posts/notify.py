@@ -0,0 +1,50 @@
+# posts/notify.py
+"""Оповещение ожидающих запросов о новых постах.
+
+Long-poll запрос за новыми постами не опрашивает базу в цикле: он спит
+на threading.Condition, пока сигнал о созданном посте не разбудит всех
+ожидающих разом. Condition живет в памяти процесса, поэтому пост,
+созданный в другом процессе, будит ожидающих только по таймауту - и тогда
+запрос еще раз смотрит в базу.
+"""
+import threading
+
+from django.db import transaction
+
+
+class Notifier:
+    """Номер последнего события и ожидание следующего.
+
+    Номер запоминается до проверки базы: событие, случившееся между
+    проверкой и ожиданием, все равно разбудит запрос.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+        # сколько запросов сейчас ждут - для замеров и мониторинга
+        self.waiting = 0
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    def wait(self, generation, timeout):
+        """Ждет события после generation; False - вышел таймаут."""
+        with self.condition:
+            self.waiting += 1
+            try:
+                return self.condition.wait_for(
+                    lambda: self.generation != generation, timeout
+                )
+            finally:
+                self.waiting -= 1
+
+
+new_posts = Notifier()
+
+
+def post_created():
+    # до коммита разбуженный запрос не увидит пост в базе
+    transaction.on_commit(new_posts.notify)
@@ -0,0 +1,210 @@
+# posts/pagecache.py
+"""Кэш страниц целиком для анонимных посетителей.
+
+View, обернутая в cache_anonymous_page, объявляет через depends(), от
+каких объектов зависит страница: постов, групп, авторов, их счетчиков и
+лент (списков постов, в которые посты добавляются и из которых
+удаляются). У каждого такого тега в кэше лежит версия - время последнего
+изменения объекта в наносекундах. Страница кэшируется вместе с версиями
+своих тегов и отдается, пока все они не изменились; сигналы меняют
+версии ровно тех тегов, которых коснулось изменение. Так сохранение
+поста сбрасывает только страницы, где он виден. Устаревшую страницу
+пересобирает один запрос, остальные тем временем получают прежнюю.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from core import routers
+
+from . import caching
+
+# тег, от которого зависят все страницы: его сбрасывает invalidate_all
+ALL = 'all'
+FEED_INDEX = 'feed:index'
+
+
+def post_tag(pk):
+    return f'post:{pk}'
+
+
+def group_tag(pk):
+    return f'group:{pk}'
+
+
+def user_tag(pk):
+    return f'user:{pk}'
+
+
+def counters_tag(user_id):
+    # счетчики подписчиков и подписок; число постов меняется вместе
+    # с лентой автора
+    return f'counters:{user_id}'
+
+
+def group_feed_tag(pk):
+    return f'feed:group:{pk}'
+
+
+def author_feed_tag(user_id):
+    return f'feed:author:{user_id}'
+
+
+def posts_tags(posts):
+    """Теги карточек постов: сами посты, их авторы и группы."""
+    tags = set()
+    for post in posts:
+        tags.add(post_tag(post.pk))
+        tags.add(user_tag(post.author_id))
+        if post.group_id is not None:
+            tags.add(group_tag(post.group_id))
+    return tags
+
+
+def _tag_key(tag):
+    return f'posts:pagecache:tag:{tag}'
+
+
+def _page_key(request):
+    digest = hashlib.md5(
+        request.get_full_path().encode('utf-8')
+    ).hexdigest()
+    return f'posts:pagecache:page:{digest}'
+
+
+def invalidate(*tags):
+    """Сбрасывает страницы, зависящие от любого из тегов."""
+    version = time.time_ns()
+    cache.set_many({_tag_key(tag): version for tag in tags}, None)
+
+
+def invalidate_all():
+    invalidate(ALL)
+
+
+def _versions(tags):
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    return {tag: found.get(key) for key, tag in keys.items()}
+
+
+def is_cacheable(request):
+    return (
+        bool(settings.PAGE_CACHE_TIMEOUT)
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def collecting(request):
+    """Собирается ли страница запроса для кэша."""
+    return hasattr(request, '_page_tags')
+
+
+def depends(request, *tags):
+    """Отмечает, от каких тегов зависит страница текущего запроса."""
+    if collecting(request):
+        request._page_tags.update(tags)
+
+
+def validators(request, *tags):
+    """Версии тегов страницы для ETag и время их последнего изменения.
+
+    Версии тегов растут при любом изменении, которое сбрасывает страницу,
+    в том числе при удалении поста из ленты, новом комментарии и
+    переименовании автора или группы, поэтому по ним и строятся ETag и
+    Last-Modified. Пропавшая из кэша версия заново ставится временем
+    начала сборки страницы, поэтому дата не идет назад.
+    """
+    tags = set(tags) | {ALL}
+    versions = _versions(tags)
+    missing = [tag for tag, version in versions.items() if version is None]
+    if missing:
+        # на наносекунду раньше начала сборки: _store кэширует страницу
+        started = getattr(request, '_page_started', None)
+        now = started - 1 if started else time.time_ns()
+        for tag in missing:
+            cache.add(_tag_key(tag), now, None)
+        versions = _versions(tags)
+    latest = max(version or 0 for version in versions.values())
+    return (
+        tuple(sorted(versions.items())),
+        datetime.fromtimestamp(latest / 10 ** 9, timezone.utc)
+    )
+
+
+def _cached(request):
+    """Закэшированная страница и признак того, что она не устарела."""
+    entry = cache.get(_page_key(request))
+    if entry is None:
+        return None, False
+    versions, response = entry
+    return response, _versions(versions) == versions
+
+
+def _not_modified(request, response):
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified')),
+        response=response
+    ) or response
+
+
+def _store(request, response, started):
+    tags = request._page_tags | {ALL}
+    versions = _versions(tags)
+    missing = [tag for tag, version in versions.items() if version is None]
+    if missing:
+        # версии нет (еще не было изменений или она вытеснена): любая
+        # будущая версия будет от нее отличаться, а как дата изменения
+        # (см. validators) она не раньше прежних
+        for tag in missing:
+            cache.add(_tag_key(tag), started - 1, None)
+        versions = _versions(tags)
+    if any(version is None or version >= started
+           for version in versions.values()):
+        # объект изменился, пока страница собиралась: она уже устарела
+        return
+    cache.set(
+        _page_key(request), (versions, response),
+        settings.PAGE_CACHE_TIMEOUT
+    )
+
+
+def cache_anonymous_page(view):
+    """Отдает анонимным посетителям страницу view из кэша."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable(request):
+            return view(request, *args, **kwargs)
+        cached, fresh = _cached(request)
+        if fresh:
+            return _not_modified(request, cached)
+        key = _page_key(request)
+        with caching.lock(key) as acquired:
+            if not acquired:
+                # страницу уже собирает другой запрос: отдаем прежнюю
+                # или ждем, пока он положит новую
+                if cached is None and caching.wait(key) is not None:
+                    cached, _ = _cached(request)
+                if cached is not None:
+                    return _not_modified(request, cached)
+            started = time.time_ns()
+            request._page_started = started
+            request._page_tags = set()
+            # страница ляжет в кэш под текущими версиями тегов: читаем
+            # из основной базы, реплика может еще не знать об изменении
+            with routers.primary():
+                response = view(request, *args, **kwargs)
+            if (response.status_code == 200 and not response.streaming
+                    and not response.cookies):
+                _store(request, response, started)
+        return response
+    return wrapper
@@ -0,0 +1,190 @@
+# posts/paginators.py
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import AutoField, Max, Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def cursor_token(pub_date, pk):
+    """Непрозрачный токен курсора по паре (pub_date, pk)."""
+    raw = f'{pub_date.isoformat()}|{pk}'
+    return urlsafe_base64_encode(raw.encode())
+
+
+def encode_cursor(post):
+    """Токен курсора, указывающий на пост."""
+    return cursor_token(post.pub_date, post.pk)
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора, для битого токена возвращает None."""
+    try:
+        pub_date, pk = force_str(urlsafe_base64_decode(token)).split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации.
+
+    Не знает ни своего номера, ни общего числа страниц - только соседей,
+    поэтому навигация строится по токенам ?after= / ?before=.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 cursor=None):
+        # номера у курсорной страницы нет
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # разобранный курсор, с которого открыта страница:
+        # ('after' | 'before', pub_date, pk) или None для начала ленты
+        self.cursor = cursor
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
+
+
+def keyset_window(queryset, direction, cursor, limit, key='pk'):
+    """Окно из limit записей ленты по одну сторону от курсора.
+
+    direction 'after' - записи старше курсора, от новых к старым (с начала
+    ленты, если курсора нет); 'before' - записи новее курсора, от старых
+    к новым (с самой старой, если курсора нет). key - поле, которое при
+    равной дате упорядочивает записи так же, как pk постов (для записей
+    ленты подписок это post_id).
+    """
+    if direction == 'before':
+        if cursor is not None:
+            pub_date, pk = cursor
+            queryset = queryset.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, **{key + '__gt': pk})
+            )
+        queryset = queryset.order_by('pub_date', key)
+    else:
+        if cursor is not None:
+            pub_date, pk = cursor
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, **{key + '__lt': pk})
+            )
+        queryset = queryset.order_by('-pub_date', '-' + key)
+    return list(queryset[:limit])
+
+
+def chronological_window(queryset, token, limit):
+    """Следующие limit записей по возрастанию (pub_date, pk).
+
+    token - токен курсора последней показанной записи (с начала, если его
+    нет или он битый). Возвращает записи и токен следующего окна или None,
+    если записей дальше нет. Так листаются комментарии к посту.
+    """
+    cursor = decode_cursor(token) if token else None
+    rows = keyset_window(queryset, 'before', cursor, limit + 1)
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, pk) без COUNT(*) и OFFSET.
+
+    Каждая страница - это один запрос WHERE ... ORDER BY ... LIMIT n + 1,
+    стоимость которого не зависит от глубины страницы. Вместо queryset
+    можно передать объект с методом keyset_window(direction, cursor, limit),
+    который сам отдает окно ленты (например, слияние нескольких источников).
+    """
+
+    def window(self, direction, cursor, limit):
+        window = getattr(self.object_list, 'keyset_window', None)
+        if window is not None:
+            return window(direction, cursor, limit)
+        return keyset_window(self.object_list, direction, cursor, limit)
+
+    def get_cursor_page(self, after=None, before=None):
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before is not None and after is None:
+            rows = self.window('before', before, self.per_page + 1)
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(
+                rows, self, True, has_previous, ('before', *before)
+            )
+        rows = self.window('after', after, self.per_page + 1)
+        has_next = len(rows) > self.per_page
+        return CursorPage(
+            rows[:self.per_page], self, has_next, after is not None,
+            ('after', *after) if after is not None else None
+        )
+
+
+def estimated_count(queryset):
+    """Оценка числа строк таблицы queryset без прохода по ней.
+
+    PostgreSQL хранит оценку в статистике планировщика (reltuples), для
+    остальных баз берется наибольший автоинкрементный ключ - это одно
+    чтение конца индекса, а удаленные строки оценку только завышают.
+    None - оценить нельзя.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # -1 - таблица еще ни разу не анализировалась
+        return int(row[0]) if row and row[0] >= 0 else None
+    if isinstance(model._meta.pk, AutoField):
+        return model._default_manager.using(queryset.db).aggregate(
+            last=Max('pk')
+        )['last'] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) по всей большой таблице.
+
+    Пока в запросе нет условий, число строк берется из estimated_count;
+    точный подсчет остается для фильтров, поиска и таблиц меньше
+    PAGINATOR_ESTIMATED_COUNT_THRESHOLD строк.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimated_count(queryset)
+            threshold = settings.PAGINATOR_ESTIMATED_COUNT_THRESHOLD
+            if estimate is not None and estimate >= threshold:
+                return estimate
+        return super().count
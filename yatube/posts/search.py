@@ -0,0 +1,256 @@
+# posts/search.py
+"""Полнотекстовый поиск по постам.
+
+Тексты разбиваются на основы слов (posts.stemmer) и хранятся в одном
+из двух индексов: виртуальной таблице SQLite FTS5 с ранжированием
+bm25() или в обычных таблицах SearchDocument/SearchPosting, где BM25
+считается на Python. Какой из них используется, задает
+POST_SEARCH_BACKEND. Индекс обновляется сигналами при сохранении
+и удалении поста, целиком перестраивается командой reindex_posts.
+"""
+import math
+import sqlite3
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Avg, Count
+
+from .models import Post, SearchDocument, SearchPosting
+from .stemmer import tokenize
+
+FTS_TABLE = 'posts_post_search'
+# параметры BM25 - те же, что у bm25() в FTS5, чтобы оба индекса
+# ранжировали одинаково
+K1 = 1.2
+B = 0.75
+TERM_MAX_LENGTH = SearchPosting._meta.get_field('term').max_length
+
+
+@lru_cache(maxsize=None)
+def fts5_supported():
+    """Собран ли SQLite с модулем FTS5."""
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE test USING fts5(terms)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def query_terms(query):
+    """Уникальные основы слов запроса в порядке следования."""
+    return list(dict.fromkeys(
+        term[:TERM_MAX_LENGTH] for term in tokenize(query)
+    ))
+
+
+class Fts5Index:
+    """Индекс в виртуальной таблице FTS5, rowid - id поста."""
+
+    def add(self, documents):
+        """Индексирует документы - пары (id поста, текст)."""
+        documents = [(pk, ' '.join(tokenize(text))) for pk, text in documents]
+        self.remove([pk for pk, _ in documents])
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, terms) VALUES (%s, %s)',
+                documents
+            )
+
+    def remove(self, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in pks]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def optimize(self):
+        """Сливает сегменты индекса после массовой загрузки."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+
+    def match(self, terms):
+        # все основы обязательны: "a" "b" в FTS5 означает a AND b
+        return ' '.join(f'"{term}"' for term in terms)
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match(terms)]
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, terms, start, stop):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}), rowid DESC LIMIT %s OFFSET %s',
+                [self.match(terms), stop - start, start]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class TableIndex:
+    """Инвертированный индекс в обычных таблицах базы.
+
+    Списки вхождений всех слов запроса читаются одним запросом
+    по индексу (term, document), ранжирование BM25 считается на Python.
+    """
+
+    def __init__(self):
+        self._ranked = dict()
+
+    def add(self, documents):
+        """Индексирует документы - пары (id поста, текст)."""
+        search_documents = list()
+        postings = list()
+        for pk, text in documents:
+            terms = [term[:TERM_MAX_LENGTH] for term in tokenize(text)]
+            search_documents.append(
+                SearchDocument(post_id=pk, length=len(terms))
+            )
+            postings += [
+                SearchPosting(term=term, document_id=pk, frequency=frequency)
+                for term, frequency in Counter(terms).items()
+            ]
+        self.remove([document.pk for document in search_documents])
+        SearchDocument.objects.bulk_create(search_documents, batch_size=500)
+        SearchPosting.objects.bulk_create(postings, batch_size=500)
+
+    def remove(self, pks):
+        SearchPosting.objects.filter(document__in=pks).delete()
+        SearchDocument.objects.filter(pk__in=pks).delete()
+
+    def clear(self):
+        SearchPosting.objects.all().delete()
+        SearchDocument.objects.all().delete()
+
+    def optimize(self):
+        pass
+
+    def scores(self, terms):
+        """Оценки BM25 постов, содержащих все основы terms."""
+        postings = SearchPosting.objects.filter(term__in=terms).values_list(
+            'term', 'document_id', 'frequency', 'document__length'
+        )
+        frequencies = defaultdict(dict)
+        lengths = dict()
+        for term, pk, frequency, length in postings:
+            frequencies[pk][term] = frequency
+            lengths[pk] = length
+        if not frequencies:
+            return dict()
+        stats = SearchDocument.objects.aggregate(
+            total=Count('pk'), average=Avg('length')
+        )
+        total, average = stats['total'], stats['average'] or 1
+        document_frequency = Counter(
+            term for found in frequencies.values() for term in found
+        )
+        idf = dict()
+        for term, found in document_frequency.items():
+            # как в FTS5: часто встречающиеся слова получают малый,
+            # но положительный вес
+            idf[term] = max(
+                math.log((total - found + 0.5) / (found + 0.5)), 1e-6
+            )
+        scores = dict()
+        for pk, found in frequencies.items():
+            if len(found) < len(terms):
+                continue
+            norm = K1 * (1 - B + B * lengths[pk] / average)
+            scores[pk] = sum(
+                idf[term] * frequency * (K1 + 1) / (frequency + norm)
+                for term, frequency in found.items()
+            )
+        return scores
+
+    def ranked(self, terms):
+        key = tuple(terms)
+        if key not in self._ranked:
+            scores = self.scores(terms)
+            self._ranked[key] = sorted(
+                scores, key=lambda pk: (-scores[pk], -pk)
+            )
+        return self._ranked[key]
+
+    def count(self, terms):
+        return len(self.ranked(terms))
+
+    def ranked_ids(self, terms, start, stop):
+        return self.ranked(terms)[start:stop]
+
+
+def get_index():
+    backend = settings.POST_SEARCH_BACKEND
+    fts5 = connection.vendor == 'sqlite' and fts5_supported()
+    if backend == 'auto':
+        backend = 'fts5' if fts5 else 'table'
+    if backend == 'fts5':
+        if not fts5:
+            raise ImproperlyConfigured(
+                'POST_SEARCH_BACKEND = "fts5" требует SQLite с модулем FTS5'
+            )
+        return Fts5Index()
+    if backend == 'table':
+        return TableIndex()
+    raise ImproperlyConfigured(
+        f'Неизвестный POST_SEARCH_BACKEND: {backend!r}'
+    )
+
+
+def index_posts(posts):
+    get_index().add((post.pk, post.text) for post in posts)
+
+
+def unindex_posts(pks):
+    get_index().remove(pks)
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности.
+
+    Ленивая последовательность для Paginator: count() и срезы
+    выполняются в индексе, посты страницы выбираются одним запросом.
+    """
+
+    def __init__(self, query):
+        self.terms = query_terms(query)
+        self.index = get_index()
+        self._count = None
+
+    def count(self):
+        if not self.terms:
+            return 0
+        if self._count is None:
+            self._count = self.index.count(self.terms)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        if not self.terms or stop <= start:
+            return list()
+        pks = self.index.ranked_ids(self.terms, start, stop)
+        posts = Post.objects.select_related('author', 'group').in_bulk(pks)
+        # посты, удаленные в обход сигналов, пропускаются до переиндексации
+        return [posts[pk] for pk in pks if pk in posts]
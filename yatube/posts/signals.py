@@ -1,31 +1,209 @@
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from sorl.thumbnail import delete
 
-from posts.models import Post
+from django.contrib.auth import get_user_model
+
+from posts import (
+    counters, following, notify, pagecache, search, thumbnails, timeline
+)
+from posts.caching import invalidate_index_cache
+from posts.models import AuthorCounters, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def track_image(sender, instance, created, raw=False, **kwargs):
+    """ new image gets thumbnails, replaced one is deleted, after commit """
+    if raw:
+        return
+    old_image = getattr(instance, '_loaded_image', None)
+    new_image = instance.image.name or None
+    if old_image != new_image:
+        # из формы, админки или shell: до готовности миниатюр в ленте
+        # показывается оригинал
+        thumbnails.schedule(instance)
+        if not created:
+            thumbnails.discard(old_image)
+    instance._loaded_image = new_image
+
+
+@receiver(post_delete, sender=Post)
+def discard_image(sender, instance, *args, **kwargs):
+    """ deleted post takes its image and thumbnails along """
+    thumbnails.discard(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_index_page(sender, instance, *args, **kwargs):
+    """ new, edited or deleted post must show up on index right away """
+    invalidate_index_cache()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, created=None, *args, **kwargs):
+    """ pages showing the post, and feeds it joins or leaves, are stale """
+    # created is None for post_delete; runs before count_post
+    # overwrites the group the post was loaded with
+    tags = [pagecache.post_tag(instance.pk)]
+    old_group_id = getattr(instance, '_loaded_group_id', instance.group_id)
+    if created is not False:
+        tags += [
+            pagecache.FEED_INDEX,
+            pagecache.author_feed_tag(instance.author_id),
+        ]
+    if created is not False or old_group_id != instance.group_id:
+        tags += [
+            pagecache.group_feed_tag(group_id)
+            for group_id in {old_group_id, instance.group_id}
+            if group_id is not None
+        ]
+    pagecache.invalidate(*tags)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, *args, **kwargs):
+    """ comment list and comment counter belong to the post """
+    pagecache.invalidate(pagecache.post_tag(instance.post_id))
+    # счетчик комментариев есть и на карточке во фрагменте кэша главной
+    invalidate_index_cache()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, *args, **kwargs):
+    pagecache.invalidate(
+        pagecache.group_tag(instance.pk),
+        pagecache.group_feed_tag(instance.pk)
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, *args, **kwargs):
+    """ follower and following counters on both profiles change """
+    pagecache.invalidate(
+        pagecache.counters_tag(instance.author_id),
+        pagecache.counters_tag(instance.user_id)
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_pages(sender, instance, *args, **kwargs):
+    """ author names are shown on post cards and comments """
+    pagecache.invalidate(pagecache.user_tag(instance.pk))
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, *args, **kwargs):
+    """ new post goes to the timelines of the author's followers """
+    if raw:
+        return
+    if created:
+        timeline.fan_out_post(instance)
+    else:
+        timeline.update_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def notify_new_post(sender, instance, created, raw=False, *args, **kwargs):
+    """ long-poll requests waiting for new posts wake up """
+    if created and not raw:
+        notify.post_created()
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, *args, **kwargs):
+    """ new subscription brings the author's latest posts to the timeline """
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, instance, *args, **kwargs):
+    """ unsubscribed author's posts leave the timeline """
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def cache_follow(sender, instance, created, raw=False, *args, **kwargs):
+    """ cached set of followed authors stays current """
+    if created and not raw:
+        following.forget(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def cache_unfollow(sender, instance, *args, **kwargs):
+    following.forget(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def create_counters(sender, instance, created, raw=False, *args, **kwargs):
+    """ every user gets a row of denormalized counters """
+    if created and not raw:
+        AuthorCounters.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, *args, **kwargs):
+    """ keep author and group post counters in step """
+    if raw:
+        return
+    if created:
+        counters.change_author(instance.author_id, posts_count=1)
+        counters.change_group(instance.group_id, 1)
+    else:
+        old_group_id = getattr(
+            instance, '_loaded_group_id', instance.group_id
+        )
+        if old_group_id != instance.group_id:
+            counters.change_group(old_group_id, -1)
+            counters.change_group(instance.group_id, 1)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, *args, **kwargs):
+    counters.change_author(instance.author_id, posts_count=-1)
+    counters.change_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, *args, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, *args, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, *args, **kwargs):
+    if created and not raw:
+        counters.change_author(instance.author_id, followers_count=1)
+        counters.change_author(instance.user_id, following_count=1)
+        timeline.followers_changed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, *args, **kwargs):
+    counters.change_author(instance.author_id, followers_count=-1)
+    counters.change_author(instance.user_id, following_count=-1)
+    timeline.followers_changed(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, *args, **kwargs):
+    """ new or edited post is searchable right away """
+    if not raw:
+        search.index_posts([instance])
 
 
 @receiver(post_delete, sender=Post)
-def post_save_image(sender, instance, *args, **kwargs):
-    """ Clean Old Image file """
-    try:
-        old_img = instance.__class__.objects.get(id=instance.id).image.name
-        delete(old_img)
-    except Exception:
-        pass
-
-
-@receiver(pre_save, sender=Post)
-def pre_save_image(sender, instance, *args, **kwargs):
-    """ instance old image file will delete from os """
-
-    try:
-        old_img = instance.__class__.objects.get(id=instance.id).image.name
-        try:
-            new_img = instance.image.name
-        except Exception:
-            new_img = None
-        if new_img != old_img:
-            delete(old_img)
-    except Exception:
-        pass
+def unindex_post(sender, instance, *args, **kwargs):
+    search.unindex_posts([instance.pk])
@@ -0,0 +1,131 @@
+# posts/stemmer.py
+"""Токенизация и стемминг текстов постов для поиска.
+
+Стеммер - реализация алгоритма Snowball для русского языка
+(https://snowballstem.org/algorithms/russian/stemmer.html). Слова
+без кириллицы остаются как есть, только приводятся к нижнему регистру.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+WORD_RE = re.compile(r'[^\W_]+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+
+
+def _endings(*groups):
+    """Окончания группы, самые длинные первыми.
+
+    Окончания первой группы допустимы только после "а" или "я".
+    """
+    endings = list()
+    for number, group in enumerate(groups):
+        endings += [(ending, number == 0 and len(groups) > 1)
+                    for ending in group]
+    return sorted(endings, key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND = _endings(
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _endings((
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = _endings(
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = _endings(('ся', 'сь'))
+VERB = _endings(
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = _endings((
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+SUPERLATIVE = _endings(('ейш', 'ейше'))
+DERIVATIONAL = _endings(('ост', 'ость'))
+
+
+def _regions(word):
+    """Начала областей RV и R2 слова."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+
+    def after_consonant(start):
+        for i in range(max(start, 1), len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = after_consonant(1)
+    return rv, after_consonant(r1 + 1)
+
+
+def _cut(word, start, endings):
+    """Отрезает самое длинное окончание, лежащее в word[start:].
+
+    Возвращает None, если ни одно окончание не подошло.
+    """
+    region = word[start:]
+    for ending, after_a in endings:
+        if not region.endswith(ending):
+            continue
+        stem = region[:-len(ending)]
+        if after_a and not stem.endswith(('а', 'я')):
+            continue
+        return word[:-len(ending)]
+    return None
+
+
+# словарь текстов невелик, а слова повторяются: основы кэшируются
+@lru_cache(maxsize=65536)
+def stem(word):
+    """Основа слова word (в нижнем регистре, "ё" заменена на "е")."""
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv, r2 = _regions(word)
+    # шаг 1: деепричастие, иначе возвратная частица и затем
+    # прилагательное (с причастием), глагол или существительное
+    result = _cut(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _cut(word, rv, REFLEXIVE) or word
+        result = _cut(word, rv, ADJECTIVE)
+        if result is not None:
+            result = _cut(result, rv, PARTICIPLE) or result
+        else:
+            result = _cut(word, rv, VERB)
+            if result is None:
+                result = _cut(word, rv, NOUN)
+    if result is not None:
+        word = result
+    # шаг 2
+    if word[rv:].endswith('и'):
+        word = word[:-1]
+    # шаг 3: словообразовательные суффиксы в R2
+    word = _cut(word, r2, DERIVATIONAL) or word
+    # шаг 4: превосходная степень, двойное "н" и мягкий знак
+    result = _cut(word, rv, SUPERLATIVE)
+    if result is not None:
+        word = result
+    if word[rv:].endswith('нн'):
+        word = word[:-1]
+    elif result is None and word[rv:].endswith('ь'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Основы слов текста в порядке следования."""
+    text = text.lower().replace('ё', 'е')
+    return [stem(word) for word in WORD_RE.findall(text)]
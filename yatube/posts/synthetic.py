@@ -0,0 +1,170 @@
+# posts/synthetic.py
+"""Воспроизводимый синтетический набор данных для нагрузочных замеров.
+
+Записи генерируются в формате posts.transfer и загружаются тем же
+Importer, что и выгрузки других окружений. Распределения похожи
+на настоящие: у немногих авторов много подписчиков и постов
+(распределение Парето), число подписок пользователя - логнормальное,
+комментарии достаются в основном популярным постам.
+"""
+import bisect
+import itertools
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+
+WORDS = (
+    'город лес река утро вечер книга музыка кофе дорога поезд море солнце '
+    'дождь снег друг работа проект код тест сервер база запрос страница '
+    'новость фото прогулка выходные отпуск горы парк история идея вопрос '
+    'ответ спасибо сегодня вчера завтра хорошо интересно важно быстро '
+    'медленно красиво новый старый большой маленький первый последний'
+).split()
+
+
+class SyntheticData:
+    """Генератор записей выгрузки с фиксированным зерном.
+
+    users, posts, groups - размеры набора; comments - среднее число
+    комментариев на пост; follows - медиана числа подписок пользователя;
+    images - доля постов с картинкой (картинки берутся из небольшого
+    общего набора файлов, чтобы не забивать диск).
+    """
+    IMAGE_FILES = 20
+    DAYS = 365
+
+    def __init__(self, users=1000, posts=100000, groups=50, comments=2.0,
+                 follows=20, images=0.1, seed=42):
+        self.users = users
+        self.posts = posts
+        self.groups = groups
+        self.comments = comments
+        self.follows = follows
+        self.images = images
+        self.seed = seed
+        self.random = random.Random(seed)
+        # популярность и активность авторов: тяжелый хвост Парето
+        self.popularity = self.cumulative(
+            self.random.paretovariate(1.2) for _ in range(users)
+        )
+        self.activity = self.cumulative(
+            self.random.paretovariate(1.5) for _ in range(users)
+        )
+        self.now = timezone.now().replace(microsecond=0)
+
+    @staticmethod
+    def cumulative(weights):
+        return list(itertools.accumulate(weights))
+
+    def pick(self, cum_weights):
+        """Индекс по накопленным весам за O(log n)."""
+        point = self.random.random() * cum_weights[-1]
+        return bisect.bisect(cum_weights, point)
+
+    def username(self, index):
+        return f'user{index}'
+
+    def image_names(self):
+        return [
+            f'posts/synthetic_{self.seed}_{num}.jpg'
+            for num in range(self.IMAGE_FILES)
+        ]
+
+    def save_images(self):
+        """Кладет в хранилище общий набор картинок, если его там нет."""
+        rng = random.Random(self.seed)
+        for name in self.image_names():
+            if default_storage.exists(name):
+                continue
+            color = tuple(rng.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def text(self, low, high):
+        words = self.random.choices(WORDS, k=self.random.randint(low, high))
+        return ' '.join(words).capitalize()
+
+    def records(self):
+        """Записи выгрузки по порядку: группы, посты, комментарии, подписки."""
+        yield from self.group_records()
+        # веса постов для комментариев: обсуждают в основном немногие посты
+        weights = list()
+        for record in self.post_records():
+            weights.append(self.random.paretovariate(1.5))
+            yield record
+        yield from self.comment_records(self.cumulative(weights))
+        yield from self.follow_records()
+
+    def group_records(self):
+        for num in range(self.groups):
+            yield {
+                'model': 'group',
+                'slug': f'group{num}',
+                'title': f'Группа {num}',
+                'description': self.text(5, 20),
+            }
+
+    def pub_date(self, key):
+        # посты идут в хронологическом порядке, как в живой базе
+        return self.now - timedelta(days=self.DAYS) * (
+            1 - key / max(self.posts, 1)
+        )
+
+    def post_records(self):
+        images = self.image_names()
+        for key in range(1, self.posts + 1):
+            image = ''
+            if self.random.random() < self.images:
+                image = self.random.choice(images)
+            group = None
+            if self.groups and self.random.random() < 0.6:
+                group = f'group{self.random.randrange(self.groups)}'
+            yield {
+                'model': 'post',
+                'key': key,
+                'author': self.username(self.pick(self.activity)),
+                'group': group,
+                'text': self.text(5, 80),
+                'pub_date': self.pub_date(key).isoformat(),
+                'image': image,
+            }
+
+    def comment_records(self, post_weights):
+        for _ in range(int(self.posts * self.comments)):
+            key = self.pick(post_weights) + 1
+            minutes = timedelta(minutes=self.random.randrange(60 * 24))
+            yield {
+                'model': 'comment',
+                'post': key,
+                'author': self.username(self.random.randrange(self.users)),
+                'text': self.text(3, 30),
+                'pub_date': (self.pub_date(key) + minutes).isoformat(),
+            }
+
+    def follow_records(self):
+        for index in range(self.users):
+            degree = min(
+                int(self.random.lognormvariate(0, 1) * self.follows),
+                self.users - 1
+            )
+            authors = set()
+            # попытки ограничены: при большой степени популярные авторы
+            # выпадают повторно
+            for _ in range(degree * 3):
+                if len(authors) >= degree:
+                    break
+                author = self.pick(self.popularity)
+                if author != index:
+                    authors.add(author)
+            for author in sorted(authors):
+                yield {
+                    'model': 'follow',
+                    'user': self.username(index),
+                    'author': self.username(author),
+                }
@@ -0,0 +1,20 @@
+from django import template
+
+from posts.thumbnails import prefetch_thumbnails, ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image, alias):
+    """Готовая миниатюра alias из POST_THUMBNAILS или сама картинка."""
+    if not image:
+        return None
+    return ready_thumbnail(image, alias) or image
+
+
+@register.simple_tag(name='prefetch_thumbnails')
+def prefetch_post_thumbnails(posts, alias):
+    """Разом проверяет миниатюры alias для картинок постов страницы."""
+    prefetch_thumbnails((post.image for post in posts), alias)
+    return ''
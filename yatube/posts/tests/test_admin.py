@@ -0,0 +1,105 @@
+# posts/tests/test_admin.py
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# запросов на страницу списка админки: сессия, пользователь, подсчет,
+# строки с JOIN связанных объектов и служебные запросы самой админки;
+# число не должно зависеть от числа строк на странице
+ADMIN_QUERY_BUDGET = {
+    'post': 6,
+    'comment': 5,
+    'follow': 5,
+}
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title='Тестовая группа ' + str(num),
+                slug='slug' + str(num),
+                description='Тестовое описание',
+            ) for num in range(3)
+        ]
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(AdminChangelistTests.admin)
+
+    def add_rows(self, count):
+        """count авторов, у каждого пост, комментарий и подписка"""
+        for num in range(count):
+            author = User.objects.create_user(
+                username=f'Author{User.objects.count()}'
+            )
+            post = Post.objects.create(
+                author=author,
+                text='Тестовый пост',
+                group=self.groups[num % len(self.groups)],
+            )
+            Comment.objects.create(post=post, author=author, text='Текст')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def changelist(self, model_name, data=None):
+        url = reverse(f'admin:posts_{model_name}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            response = self.admin_client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_query_budget(self):
+        """число запросов списка не растет с числом строк"""
+        self.add_rows(3)
+        for model_name, budget in ADMIN_QUERY_BUDGET.items():
+            with self.subTest(model_name=model_name):
+                _, queries = self.changelist(model_name)
+                self.assertEqual(queries, budget)
+        self.add_rows(20)
+        for model_name, budget in ADMIN_QUERY_BUDGET.items():
+            with self.subTest(model_name=model_name, rows=23):
+                response, queries = self.changelist(model_name)
+                self.assertEqual(queries, budget)
+                self.assertEqual(response.context['cl'].result_count, 23)
+
+    def test_username_filter(self):
+        """фильтр по имени не выводит всех пользователей в боковой панели"""
+        self.add_rows(3)
+        for model_name in ADMIN_QUERY_BUDGET:
+            with self.subTest(model_name=model_name):
+                response, _ = self.changelist(
+                    model_name, {'author': 'Author2'}
+                )
+                result_list = response.context['cl'].result_list
+                self.assertEqual(
+                    [obj.author.username for obj in result_list], ['Author2']
+                )
+                self.assertNotContains(response, 'Author3')
+        response, _ = self.changelist('follow', {'user': 'Nobody'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_estimated_count(self):
+        """без фильтров число строк большой таблицы оценивается"""
+        self.add_rows(5)
+        Post.objects.filter(pk__in=Post.objects.order_by('pk')[:2]).delete()
+        with self.settings(PAGINATOR_ESTIMATED_COUNT_THRESHOLD=1):
+            response, _ = self.changelist('post')
+            self.assertEqual(
+                response.context['cl'].result_count,
+                Post.objects.order_by('-pk').first().pk
+            )
+            response, _ = self.changelist('post', {'q': 'Тестовый'})
+            self.assertEqual(response.context['cl'].result_count, 3)
+        response, _ = self.changelist('post')
+        self.assertEqual(response.context['cl'].result_count, 3)
@@ -0,0 +1,254 @@
+# posts/tests/test_api.py
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import notify
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3, API_EXCERPT_LENGTH=10)
+class FeedApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.other = User.objects.create_user(username='Other')
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:api_index'),
+            'group_list': reverse(
+                'posts:api_group_list', kwargs={'slug': self.group.slug}
+            ),
+            'profile': reverse(
+                'posts:api_profile',
+                kwargs={'username': self.author.username}
+            ),
+        }
+
+    def add_posts(self, count, author=None, group=None):
+        start = timezone.now()
+        posts = list()
+        for i in range(count):
+            post = Post.objects.create(
+                author=author or self.author, group=group,
+                text=f'Текст поста номер {i}'
+            )
+            # пары постов с одинаковой датой проверяют порядок по pk;
+            # save() переносит дату и в ленты подписчиков
+            post.pub_date = start + timedelta(seconds=i // 2)
+            post.save()
+            posts.append(post.pk)
+        return posts
+
+    def ordered(self, posts):
+        """id постов в порядке лент: от новых к старым"""
+        return list(
+            Post.objects.filter(pk__in=posts).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pk', flat=True)
+        )
+
+    def walk(self, url, client=None):
+        """id постов всех порций ленты"""
+        client = client or self.guest_client
+        found = list()
+        params = {'fields': 'id'}
+        while True:
+            data = client.get(url, params).json()
+            found.extend(document['id'] for document in data['results'])
+            if data['next'] is None:
+                return found
+            params['after'] = data['next']
+
+    def test_feeds(self):
+        """курсор проходит каждую ленту без пропусков и повторов"""
+        own = self.add_posts(4, group=self.group)
+        other = self.add_posts(3, author=self.other)
+        feeds = {
+            'index': self.ordered(own + other),
+            'group_list': self.ordered(own),
+            'profile': self.ordered(own),
+        }
+        for name, expected in feeds.items():
+            with self.subTest(name=name):
+                self.assertEqual(self.walk(self.urls[name]), expected)
+
+    def test_document(self):
+        """документ поста со всеми полями"""
+        post = Post.objects.create(
+            author=self.author, group=self.group,
+            text='Очень длинный текст поста'
+        )
+        data = self.guest_client.get(self.urls['index']).json()
+        self.assertEqual(data['results'], [{
+            'id': post.pk,
+            'pub_date': post.pub_date.isoformat(),
+            'excerpt': 'Очень дли…',
+            'author': 'Author',
+            'group': 'slug',
+            'thumbnail': None,
+            'comments_count': 0,
+        }])
+        self.assertIsNone(data['next'])
+
+    def test_fields(self):
+        """fields= оставляет только нужные поля и столбцы"""
+        self.add_posts(1)
+        with CaptureQueriesContext(connection) as context:
+            data = self.guest_client.get(
+                self.urls['index'], {'fields': 'id,author'}
+            ).json()
+        self.assertEqual(list(data['results'][0]), ['id', 'author'])
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('posts_group', sql)
+
+    def test_unknown_field(self):
+        """неизвестное поле - 400 с описанием"""
+        response = self.guest_client.get(
+            self.urls['index'], {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_no_instances(self):
+        """строки сериализуются без создания экземпляров Post"""
+        self.add_posts(4)
+        with mock.patch.object(Post, 'from_db', side_effect=AssertionError):
+            for url in self.urls.values():
+                self.assertEqual(self.guest_client.get(url).status_code, 200)
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_queries_do_not_depend_on_page(self):
+        """число запросов не зависит от числа постов и групп"""
+        self.add_posts(1, group=self.group)
+        with self.assertNumQueries(1):
+            self.guest_client.get(self.urls['index'])
+        self.add_posts(5, author=self.other, group=self.group)
+        with self.assertNumQueries(1):
+            self.guest_client.get(self.urls['index'])
+        with self.assertNumQueries(2):
+            self.guest_client.get(self.urls['group_list'])
+
+    def test_missing(self):
+        """несуществующие группа и автор - 404"""
+        for url in (
+            reverse('posts:api_group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:api_profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    def test_follow_requires_login(self):
+        """лента подписок без входа - 401, а не редирект"""
+        response = self.guest_client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+    def test_follow(self):
+        """лента подписок сливает материализованную ленту и знаменитостей"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.other)
+        Follow.objects.create(user=self.author, author=self.other)
+        cache.clear()
+        own = self.add_posts(3)
+        other = self.add_posts(4, author=self.other)
+        self.add_posts(2, author=self.reader)
+        self.assertEqual(
+            self.walk(reverse('posts:api_follow_index'),
+                      self.authorized_client),
+            self.ordered(own + other)
+        )
+
+
+@override_settings(LONGPOLL_TIMEOUT=5)
+class NewPostsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.guest_client = Client()
+        self.url = reverse('posts:api_new_posts')
+
+    def test_newer_exists(self):
+        """если новые посты уже есть, ответ сразу"""
+        newer = Post.objects.create(author=self.author, text='Новый пост')
+        with mock.patch.object(notify.new_posts, 'wait') as wait:
+            data = self.guest_client.get(
+                self.url, {'since': self.post.pk, 'fields': 'id'}
+            ).json()
+        wait.assert_not_called()
+        self.assertEqual(data, {
+            'results': [{'id': newer.pk}], 'latest': newer.pk
+        })
+
+    @override_settings(API_PAGE_SIZE=2)
+    def test_drain(self):
+        """порции новых постов по since = latest отдают все посты"""
+        newer = [
+            Post.objects.create(author=self.author, text=f'Пост {num}').pk
+            for num in range(5)
+        ]
+        found, since = list(), self.post.pk
+        while True:
+            data = self.guest_client.get(
+                self.url, {'since': since, 'fields': 'id', 'timeout': 0}
+            ).json()
+            if not data['results']:
+                break
+            found.extend(document['id'] for document in data['results'])
+            since = data['latest']
+        self.assertEqual(found, newer)
+
+    def test_timeout(self):
+        """без новых постов по таймауту пустой ответ"""
+        response = self.guest_client.get(
+            self.url, {'since': self.post.pk, 'timeout': 0.1}
+        )
+        self.assertEqual(
+            response.json(), {'results': [], 'latest': self.post.pk}
+        )
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_wakeup(self):
+        """оповещение будит ожидающий запрос до таймаута"""
+        timer = threading.Timer(0.1, notify.new_posts.notify)
+        started = time.monotonic()
+        timer.start()
+        self.guest_client.get(self.url, {'since': self.post.pk})
+        timer.join()
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_notify_on_create(self):
+        """созданный пост оповещает после коммита, правка - нет"""
+        generation = notify.new_posts.generation
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=lambda func: func()
+        ):
+            Post.objects.create(author=self.author, text='Новый пост')
+            self.post.text = 'Исправленный пост'
+            self.post.save()
+        self.assertEqual(notify.new_posts.generation, generation + 1)
+
+    def test_bad_since(self):
+        """нечисловой since - 400"""
+        response = self.guest_client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
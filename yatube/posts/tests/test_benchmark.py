@@ -0,0 +1,106 @@
+# posts/tests/test_benchmark.py
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import thumbnails
+from ..benchmark import ENDPOINTS
+from ..models import AuthorCounters, Comment, Follow, Post, TimelineEntry
+from ..synthetic import SyntheticData
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+NOW = timezone.now()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch.object(thumbnails.pool, 'workers', 0)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, **options):
+        out = StringIO()
+        call_command(
+            'generate_data', users=20, posts=60, groups=3, comments=1,
+            follows=3, images=0.1, stdout=out, **options
+        )
+        return out.getvalue()
+
+    def test_same_seed_same_records(self):
+        """одно зерно - один и тот же набор записей"""
+        def records(seed):
+            data = SyntheticData(users=10, posts=30, groups=2, seed=seed)
+            data.now = NOW
+            return list(data.records())
+
+        self.assertEqual(records(1), records(1))
+        self.assertNotEqual(records(1), records(2))
+
+    def test_generate_data(self):
+        """набор загружается с подписками, счетчиками и лентами"""
+        out = self.generate()
+        self.assertIn('post: 60', out)
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(
+            sum(AuthorCounters.objects.values_list('posts_count', flat=True)),
+            60
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+        # посты идут в хронологическом порядке
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_bench_views(self):
+        """замер всех страниц, отчет в JSON и сравнение с прошлым"""
+        self.generate()
+        report = os.path.join(TEMP_MEDIA_ROOT, 'report.json')
+        call_command(
+            'bench_views', requests=3, warmup=1, output=report,
+            stdout=StringIO()
+        )
+        with open(report, encoding='utf-8') as file:
+            current = json.load(file)
+        self.assertEqual(set(current['endpoints']), set(ENDPOINTS))
+        self.assertEqual(current['dataset']['posts'], 60)
+        for endpoint, result in current['endpoints'].items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        out = StringIO()
+        call_command(
+            'bench_views', 'index', requests=3, via='wsgi', compare=report,
+            stdout=out
+        )
+        self.assertIn('index: p50_ms', out.getvalue())
+
+    def test_bench_longpoll(self):
+        """замер ожидающих long-poll запросов будит их всех"""
+        out = StringIO()
+        call_command('bench_longpoll', '3', timeout=5, stdout=out)
+        self.assertIn('3: в ожидании 3', out.getvalue())
+        self.assertIn('ошибок 0', out.getvalue())
+
+    def test_unknown_endpoint(self):
+        """неизвестная страница - ошибка команды"""
+        with self.assertRaises(CommandError):
+            call_command('bench_views', 'nowhere', stdout=StringIO())
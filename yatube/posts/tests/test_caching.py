@@ -0,0 +1,145 @@
+# posts/tests/test_caching.py
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import SimpleTestCase, override_settings
+
+from .. import caching
+
+TEMP_CACHE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    CACHE_STALE_TIMEOUT=60,
+    CACHE_LOCK_TIMEOUT=10,
+    CACHE_LOCK_WAIT=0.2,
+    CACHE_EARLY_EXPIRATION_BETA=1.0,
+)
+class RememberTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='значение', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_cached(self):
+        """значение вычисляется один раз"""
+        for _ in range(3):
+            self.assertEqual(
+                caching.remember('key', self.compute(), 60), 'значение'
+            )
+        self.assertEqual(self.calls, 1)
+
+    def test_one_recompute_under_load(self):
+        """холодный ключ под нагрузкой считает один поток"""
+        results = list()
+
+        def worker():
+            results.append(
+                caching.remember('key', self.compute(delay=0.05), 60)
+            )
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['значение'] * 10)
+
+    def test_stale_while_revalidate(self):
+        """истекшее значение отдается, пока его пересчитывает другой"""
+        caching.store('key', 'старое', 60)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            with caching.lock('key') as acquired:
+                self.assertTrue(acquired)
+                self.assertEqual(
+                    caching.remember('key', self.compute('новое'), 60),
+                    'старое'
+                )
+            self.assertEqual(self.calls, 0)
+            self.assertEqual(
+                caching.remember('key', self.compute('новое'), 60), 'новое'
+            )
+        self.assertEqual(self.calls, 1)
+
+    def test_lock_timeout(self):
+        """без значения и при чужой блокировке ждем, потом считаем сами"""
+        with caching.lock('key'):
+            started = time.monotonic()
+            self.assertEqual(
+                caching.remember('key', self.compute(), 60), 'значение'
+            )
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(self.calls, 1)
+
+    def test_early_expiration(self):
+        """долгое вычисление пересчитывается раньше срока"""
+        caching.store('key', 'старое', 60, delta=30)
+        with mock.patch('random.random', return_value=0.01):
+            # -30 * ln(0.01) ~ 138 с упреждения при сроке 60 с
+            self.assertEqual(
+                caching.remember('key', self.compute('новое'), 60), 'новое'
+            )
+        with mock.patch('random.random', return_value=0.99):
+            self.assertEqual(
+                caching.remember('key', self.compute('другое'), 60), 'новое'
+            )
+        self.assertEqual(self.calls, 1)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': TEMP_CACHE_DIR,
+    },
+})
+class FileCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def test_shared_between_handlers(self):
+        """значение в файловом кэше видно из другого потока"""
+        caching.remember('key', lambda: 'значение', 60)
+        found = list()
+        thread = threading.Thread(
+            target=lambda: found.append(caching.peek('key'))
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(found, ['значение'])
+        with caching.lock('key') as acquired:
+            self.assertTrue(acquired)
+            with caching.lock('key') as again:
+                self.assertFalse(again)
+
+    def test_lock_file(self):
+        """блокировка файлового кэша не полагается на его add"""
+        with mock.patch.object(FileBasedCache, 'add', return_value=True):
+            with caching.lock('key') as acquired:
+                self.assertTrue(acquired)
+                with caching.lock('key') as again:
+                    self.assertFalse(again)
+        with caching.lock('key') as acquired:
+            self.assertTrue(acquired)
+
+    def test_expired_lock_file(self):
+        """истекшая блокировка зависшего процесса снимается"""
+        with caching.lock('key') as acquired:
+            self.assertTrue(acquired)
+            with self.settings(CACHE_LOCK_TIMEOUT=0):
+                with caching.lock('key') as again:
+                    self.assertTrue(again)
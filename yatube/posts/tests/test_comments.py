@@ -0,0 +1,117 @@
+# posts/tests/test_comments.py
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=3, PAGE_CACHE_TIMEOUT=0)
+class CommentsPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.guest_client = Client()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.comments_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        )
+
+    def add_comments(self, count):
+        start = timezone.now()
+        comments = list()
+        for i in range(count):
+            user = User.objects.create_user(
+                username=f'user{Comment.objects.count()}'
+            )
+            comment = Comment.objects.create(
+                post=self.post, author=user, text=f'Комментарий {i}'
+            )
+            # две пары комментариев с одинаковой датой проверяют порядок
+            # по pk
+            Comment.objects.filter(pk=comment.pk).update(
+                pub_date=start + timedelta(seconds=i // 2)
+            )
+            comments.append(comment.pk)
+        return comments
+
+    def test_first_page(self):
+        """на странице поста первые комментарии от старых к новым"""
+        comments = self.add_comments(5)
+        response = self.guest_client.get(self.detail_url)
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            comments[:3]
+        )
+        self.assertIsNotNone(response.context['comments_next'])
+        self.assertContains(response, 'data-comments-more')
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.guest_client.get(url).status_code, 200)
+        return len(context.captured_queries)
+
+    def test_queries_do_not_depend_on_comments(self):
+        """авторы комментариев приходят тем же запросом"""
+        self.add_comments(1)
+        queries = self.queries(self.detail_url)
+        self.add_comments(3)
+        self.assertEqual(self.queries(self.detail_url), queries)
+        self.assertEqual(self.queries(self.comments_url), 2)
+
+    def test_walk_with_cursor(self):
+        """курсор проходит все комментарии без пропусков и повторов"""
+        comments = self.add_comments(7)
+        found = list()
+        url = self.comments_url + '?format=json'
+        while url:
+            data = self.guest_client.get(url).json()
+            found.extend(comment['id'] for comment in data['comments'])
+            url = data['next'] and (
+                f'{self.comments_url}?format=json&after={data["next"]}'
+            )
+        self.assertEqual(found, comments)
+
+    def test_fragment(self):
+        """фрагмент содержит порцию комментариев и кнопку следующей"""
+        self.add_comments(5)
+        cursor = self.guest_client.get(self.detail_url).context[
+            'comments_next'
+        ]
+        response = self.guest_client.get(
+            self.comments_url, {'after': cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, 'Комментарий 3')
+        self.assertContains(response, 'Комментарий 4')
+        self.assertNotContains(response, 'Комментарий 2')
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_json(self):
+        """JSON с данными комментария и токеном следующей порции"""
+        self.add_comments(2)
+        data = self.guest_client.get(
+            self.comments_url, {'format': 'json'}
+        ).json()
+        self.assertIsNone(data['next'])
+        self.assertEqual(data['comments'][0]['author'], 'user0')
+        self.assertEqual(data['comments'][0]['text'], 'Комментарий 0')
+
+    def test_missing_post(self):
+        """для несуществующего поста - 404"""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,192 @@
+# posts/tests/test_conditional.py
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import pagecache
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_SHARED_MAX_AGE=60)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group
+        )
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+        }
+
+    def revalidate(self, url, client=None):
+        """повторный запрос с валидаторами первого ответа"""
+        client = client or self.guest_client
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """неизменная страница - 304 без рендеринга шаблона"""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response.content, b'')
+                self.assertTrue(response.has_header('ETag'))
+
+    def test_if_modified_since(self):
+        """Last-Modified годится для If-Modified-Since"""
+        url = self.urls['post_detail']
+        response = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate(self):
+        """правка поста и новый комментарий меняют ETag страниц"""
+        etags = {
+            name: self.guest_client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        for name, url in self.urls.items():
+            with self.subTest(name=name, change='edit'):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, 200)
+                etags[name] = response['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        for name in ('group_list', 'profile', 'post_detail'):
+            with self.subTest(name=name, change='comment'):
+                response = self.guest_client.get(
+                    self.urls[name], HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_delete_invalidates(self):
+        """удаленный пост пропадает со страниц лент"""
+        Post.objects.create(author=self.author, text='Второй пост')
+        etags = {
+            name: self.guest_client.get(self.urls[name])['ETag']
+            for name in ('index', 'profile')
+        }
+        self.post.delete()
+        for name, etag in etags.items():
+            with self.subTest(name=name):
+                response = self.guest_client.get(
+                    self.urls[name], HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_follows_names_and_comments(self):
+        """переименование автора и комментарий меняют ETag страниц"""
+        etags = {
+            name: self.guest_client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        self.author.first_name = 'Лев'
+        self.author.save()
+        for name in ('group_list', 'profile', 'post_detail'):
+            with self.subTest(name=name, change='rename'):
+                response = self.guest_client.get(
+                    self.urls[name], HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Лев')
+                etags[name] = response['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        for name, url in self.urls.items():
+            with self.subTest(name=name, change='comment'):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_last_modified_advances(self):
+        """удаление поста и переименования сдвигают Last-Modified вперед"""
+        newest = Post.objects.create(
+            author=self.author, text='Второй пост', group=self.group
+        )
+        changes = {
+            'profile': newest.delete,
+            'group_list': lambda: Group.objects.get(pk=self.group.pk).save(),
+            'post_detail': lambda: User.objects.get(pk=self.author.pk).save(),
+        }
+        for shift, (name, change) in enumerate(changes.items(), start=1):
+            with self.subTest(name=name):
+                url = self.urls[name]
+                last_modified = self.guest_client.get(url)['Last-Modified']
+                # изменение - заметно позже: заголовок точен до секунды
+                later = time.time_ns() + shift * 5 * 10 ** 9
+                with mock.patch.object(
+                    pagecache.time, 'time_ns', return_value=later
+                ):
+                    change()
+                response = self.guest_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_per_user(self):
+        """ETag зависит от пользователя и его подписки"""
+        url = self.urls['profile']
+        guest_etag = self.guest_client.get(url)['ETag']
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=guest_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        # кэш подписок сбрасывается после коммита
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=lambda func: func()
+        ):
+            Follow.objects.create(user=self.reader, author=self.author)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
+
+    def test_cache_control(self):
+        """анонимные страницы кэширует прокси, личные - только браузер"""
+        url = self.urls['index']
+        response = self.guest_client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=60', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
@@ -0,0 +1,158 @@
+# posts/tests/test_counters.py
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import AuthorCounters, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.groups = [
+            Group.objects.create(
+                title='Тестовая группа ' + str(num),
+                slug='slug' + str(num),
+                description='Тестовое описание',
+            ) for num in range(2)
+        ]
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def counters(self, user):
+        return AuthorCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """создание, перенос в другую группу и удаление поста"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост', 'group': self.groups[0].pk}
+        )
+        post = Post.objects.get()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.groups[0].refresh_from_db()
+        self.assertEqual(self.groups[0].posts_count, 1)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост', 'group': self.groups[1].pk}
+        )
+        for group, expected in zip(self.groups, (0, 1)):
+            group.refresh_from_db()
+            self.assertEqual(group.posts_count, expected)
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.groups[1].refresh_from_db()
+        self.assertEqual(self.groups[1].posts_count, 0)
+
+    def test_comment_counters(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        Comment.objects.get().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_comment_count_on_index(self):
+        """новый и удаленный комментарий видны на карточке главной"""
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='Пост')
+        guest_client = Client()
+        clients = (guest_client, self.reader_client)
+        for client in clients:
+            self.assertContains(
+                client.get(reverse('posts:index')), 'комментариев: 0'
+            )
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'}
+        )
+        for client in clients:
+            self.assertContains(
+                client.get(reverse('posts:index')), 'комментариев: 1'
+            )
+        Comment.objects.get().delete()
+        for client in clients:
+            self.assertContains(
+                client.get(reverse('posts:index')), 'комментариев: 0'
+            )
+
+    def test_follow_counters(self):
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Author'})
+        )
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        response = self.reader_client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'})
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Author'})
+        )
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_missing_counters_row(self):
+        """строка счетчиков создается заново с точными значениями"""
+        Post.objects.create(author=self.author, text='Пост')
+        AuthorCounters.objects.filter(user=self.author).delete()
+        Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.counters(self.author).posts_count, 2)
+
+    def test_user_delete(self):
+        """удаление пользователя с постами и подписками не ломает счетчики"""
+        Post.objects.create(author=self.reader, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader.delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertFalse(AuthorCounters.objects.filter(user_id=None).exists())
+
+    def test_reconcile_command(self):
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.groups[0]
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        # ломаем счетчики в обход сигналов
+        Post.objects.update(comments_count=7)
+        Group.objects.update(posts_count=7)
+        AuthorCounters.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        AuthorCounters.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            list(Group.objects.values_list('posts_count', flat=True)),
+            [1, 0]
+        )
+        author = self.counters(self.author)
+        self.assertEqual(
+            (author.posts_count, author.followers_count,
+             author.following_count),
+            (1, 1, 0)
+        )
+        reader = self.counters(self.reader)
+        self.assertEqual(
+            (reader.posts_count, reader.followers_count,
+             reader.following_count),
+            (0, 0, 1)
+        )
@@ -0,0 +1,137 @@
+# posts/tests/test_feeds.py
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import pagecache
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(FEED_ITEMS=2, PAGE_CACHE_TIMEOUT=60)
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='Author', first_name='Лев', last_name='Толстой'
+        )
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {num}'
+            )
+            for num in range(3)
+        ]
+        self.guest_client = Client()
+        self.urls = {
+            name: reverse(f'posts:{name}', kwargs=kwargs)
+            for name, kwargs in (
+                ('index_rss', {}),
+                ('index_atom', {}),
+                ('group_rss', {'slug': self.group.slug}),
+                ('group_atom', {'slug': self.group.slug}),
+                ('profile_rss', {'username': self.author.username}),
+                ('profile_atom', {'username': self.author.username}),
+            )
+        }
+
+    def test_feeds(self):
+        """ленты отдают последние FEED_ITEMS постов"""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                kind = 'atom' if name.endswith('atom') else 'rss'
+                self.assertIn(kind, response['Content-Type'])
+                self.assertContains(response, 'Пост 2')
+                self.assertContains(response, 'Пост 1')
+                self.assertNotContains(response, 'Пост 0')
+                self.assertContains(response, 'Лев Толстой')
+                self.assertContains(response, reverse(
+                    'posts:post_detail',
+                    kwargs={'post_id': self.posts[2].pk}
+                ))
+
+    def test_not_modified(self):
+        """опрос с валидаторами прошлого ответа - 304 без запросов"""
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    etag = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                    since = self.guest_client.get(
+                        url,
+                        HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    )
+                self.assertEqual(etag.status_code, 304)
+                self.assertEqual(since.status_code, 304)
+
+    def test_changes(self):
+        """новый пост и правка группы меняют ленты"""
+        etags = {
+            name: self.guest_client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост'
+        )
+        for name, url in self.urls.items():
+            with self.subTest(name=name, change='post'):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertContains(response, 'Новый пост')
+                etags[name] = response['ETag']
+        self.group.title = 'Новое название'
+        self.group.save()
+        response = self.guest_client.get(
+            self.urls['group_rss'], HTTP_IF_NONE_MATCH=etags['group_rss']
+        )
+        self.assertContains(response, 'Новое название')
+
+    def test_last_modified_after_delete(self):
+        """удаление поста сдвигает Last-Modified лент вперед"""
+        responses = {
+            name: self.guest_client.get(url)
+            for name, url in self.urls.items()
+        }
+        # заметно позже: заголовок точен до секунды
+        later = time.time_ns() + 5 * 10 ** 9
+        with mock.patch.object(pagecache.time, 'time_ns', return_value=later):
+            self.posts[2].delete()
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                response = self.guest_client.get(
+                    url,
+                    HTTP_IF_MODIFIED_SINCE=responses[name]['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, 'Пост 2')
+
+    def test_missing(self):
+        """лента несуществующей группы или автора - 404"""
+        for url in (
+            reverse('posts:group_rss', kwargs={'slug': 'missing'}),
+            reverse('posts:profile_atom', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    def test_discovery(self):
+        """страницы лент ссылаются на свои RSS и Atom"""
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        )
+        self.assertContains(response, self.urls['group_rss'])
+        self.assertContains(response, self.urls['group_atom'])
@@ -0,0 +1,120 @@
+# posts/tests/test_following.py
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import caching, following
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.authors = [
+            User.objects.create_user(username=f'Author{num}')
+            for num in range(3)
+        ]
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def cached(self):
+        return list(caching.peek(following.cache_key(self.reader.pk)))
+
+    def profile_url(self, author):
+        return reverse('posts:profile', kwargs={'username': author.username})
+
+    def test_profile_uses_cache(self):
+        """проверка подписки в профиле после первой загрузки без запросов"""
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        response = self.authorized_client.get(
+            self.profile_url(self.authors[1])
+        )
+        self.assertTrue(response.context['following'])
+        # автор, COUNT постов (их нет - SELECT не нужен), сессия и
+        # пользователь; подписок среди запросов нет
+        with self.assertNumQueries(4):
+            response = self.authorized_client.get(
+                self.profile_url(self.authors[0])
+            )
+        self.assertFalse(response.context['following'])
+
+    def test_follow_and_unfollow_reset_cache(self):
+        """подписка и отписка после коммита сбрасывают множество"""
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=lambda func: func()
+        ):
+            for author in reversed(self.authors):
+                following.followed_ids(self.reader)
+                self.authorized_client.get(reverse(
+                    'posts:profile_follow',
+                    kwargs={'username': author.username}
+                ))
+                self.assertIsNone(
+                    caching.peek(following.cache_key(self.reader.pk))
+                )
+            self.authorized_client.get(reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.authors[1].username}
+            ))
+        reader = User.objects.get(pk=self.reader.pk)
+        self.assertEqual(
+            list(following.followed_ids(reader)),
+            [self.authors[0].pk, self.authors[2].pk]
+        )
+        response = self.authorized_client.get(
+            self.profile_url(self.authors[1])
+        )
+        self.assertFalse(response.context['following'])
+
+    def test_rollback_keeps_cache(self):
+        """откаченная подписка не попадает в закэшированное множество"""
+        following.followed_ids(self.reader)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.authors[0])
+                raise RuntimeError
+        self.assertEqual(self.cached(), [])
+
+    def test_load_before_commit(self):
+        """массив, прочитанный до коммита подписки, не остается в кэше"""
+        load = following._load
+
+        def racing_load(user_id):
+            # подписка коммитится, пока проверка еще не записала массив
+            ids = load(user_id)
+            with mock.patch(
+                'django.db.transaction.on_commit',
+                side_effect=lambda func: func()
+            ):
+                Follow.objects.create(user=self.reader, author=self.authors[0])
+            return ids
+
+        with mock.patch.object(following, '_load', side_effect=racing_load):
+            self.assertEqual(list(following.followed_ids(self.reader)), [])
+        reader = User.objects.get(pk=self.reader.pk)
+        self.assertTrue(following.is_following(reader, self.authors[0].pk))
+
+    def test_unfollow_not_followed(self):
+        """отписка от автора без подписки - 404"""
+        response = self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.authors[0].username}
+        ))
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalidate(self):
+        """подписки в обход сигналов видны после сброса множества"""
+        following.followed_ids(self.reader)
+        Follow.objects.bulk_create(
+            Follow(user=self.reader, author=author) for author in self.authors
+        )
+        following.invalidate([self.reader.pk])
+        reader = User.objects.get(pk=self.reader.pk)
+        self.assertTrue(following.is_following(reader, self.authors[2].pk))
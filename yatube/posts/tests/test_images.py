@@ -0,0 +1,133 @@
+# posts/tests/test_images.py
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.datastructures import MultiValueDict
+from PIL import Image
+
+from ..forms import PostForm
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name, size, image_format='JPEG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(buffer, format=image_format)
+    return SimpleUploadedFile(
+        name=name,
+        content=buffer.getvalue(),
+        content_type='image/' + image_format.lower()
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='Author')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_small_image_kept(self):
+        """картинка в пределах лимитов сохраняется как есть"""
+        form = PostForm(
+            {'text': 'Пост'},
+            files={'image': make_image('small.jpg', (640, 480))}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        stats = form.image_stats
+        self.assertEqual((stats.width, stats.height), (640, 480))
+        self.assertEqual((stats.new_width, stats.new_height), (640, 480))
+        self.assertEqual(stats.decoded_bytes, 0)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_large_image_downscaled(self):
+        """слишком большая по стороне картинка уменьшается при создании"""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост', 'image': make_image('big.jpg', (4000, 1000))}
+        )
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (1000, 250))
+            self.assertEqual(image.format, 'JPEG')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_draft_decode_bounded(self):
+        """JPEG декодируется в уменьшенном масштабе, а не целиком"""
+        form = PostForm(
+            {'text': 'Пост'},
+            files={'image': make_image('big.jpg', (4000, 4000))}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertLess(form.image_stats.decoded_bytes, 4000 * 4000 * 3)
+        self.assertEqual(
+            (form.image_stats.new_width, form.image_stats.new_height),
+            (1000, 1000)
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_downscaled_upload_replaced(self):
+        """уменьшенная копия заменяет загрузку, исходная закрывается"""
+        upload = make_image('big.jpg', (2000, 1000))
+        files = MultiValueDict({'image': [upload]})
+        form = PostForm({'text': 'Пост'}, files=files)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertTrue(upload.closed)
+        self.assertIs(files['image'], form.cleaned_data['image'])
+        files['image'].close()
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_edit_downscales_png(self):
+        """при редактировании поста новая картинка тоже проходит прием"""
+        post = Post.objects.create(author=self.user, text='Пост')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост',
+             'image': make_image('big.png', (1200, 3000), 'PNG')}
+        )
+        post.refresh_from_db()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (400, 1000))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1000 * 1000)
+    def test_too_many_pixels_rejected(self):
+        """картинка больше POST_IMAGE_MAX_PIXELS отклоняется формой"""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост', 'image': make_image('huge.jpg', (2000, 1000))}
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('image', response.context['form'].errors)
+
+    @override_settings(
+        POST_IMAGE_MAX_SIDE=1000, POST_IMAGE_MAX_FULL_DECODE_PIXELS=1000 * 1000
+    )
+    def test_large_png_rejected(self):
+        """PNG, который пришлось бы декодировать целиком, отклоняется"""
+        form = PostForm(
+            {'text': 'Пост'},
+            files={'image': make_image('huge.png', (2000, 1000), 'PNG')}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'image_too_large')
+        # JPEG того же размера декодируется в уменьшенном масштабе
+        form = PostForm(
+            {'text': 'Пост'},
+            files={'image': make_image('huge.jpg', (2000, 1000))}
+        )
+        self.assertTrue(form.is_valid(), form.errors)
@@ -0,0 +1,102 @@
+# posts/tests/test_indexes.py
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import encode_cursor
+
+User = get_user_model()
+
+# таблицы, выборки из которых должны идти по индексу без сортировки
+FEED_TABLES = ('"posts_post"', '"posts_timelineentry"', '"posts_comment"')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedIndexesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for num in range(15):
+            Post.objects.create(
+                author=cls.author,
+                text='Тестовый пост №' + str(num),
+                group=cls.group,
+            )
+        cls.post = Post.objects.first()
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedIndexesTests.reader)
+
+    def feed_queries(self, url, data=None):
+        """SELECT страницы к таблицам лент с подставленными параметрами"""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url, data)
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'ORDER BY' in query['sql']
+            and any(
+                f'FROM {table}' in query['sql'] for table in FEED_TABLES
+            )
+        ]
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return ' | '.join(row[-1] for row in cursor.fetchall())
+
+    def check_urls(self, urls, data=None):
+        for url in urls:
+            queries = self.feed_queries(url, data)
+            with self.subTest(url=url):
+                self.assertTrue(queries, f'{url} не выбирает ленту')
+            for sql in queries:
+                plan = self.query_plan(sql)
+                with self.subTest(url=url, plan=plan):
+                    self.assertIn('INDEX', plan)
+                    self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feed_queries_use_index(self):
+        """ленты читаются по индексу без сортировки во временном B-дереве"""
+        self.check_urls((
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ))
+
+    def test_cursor_feed_queries_use_index(self):
+        """курсорные страницы лент тоже читаются по индексу"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:follow_index'),
+        )
+        cursor = encode_cursor(Post.objects.all()[5])
+        with self.settings(PAGINATOR_CURSOR_VIEWS=(
+            'index', 'group_list', 'profile', 'follow_index'
+        )):
+            self.check_urls(urls)
+            self.check_urls(urls, {'after': cursor})
+            self.check_urls(urls, {'before': cursor})
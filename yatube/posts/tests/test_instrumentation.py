@@ -0,0 +1,97 @@
+# posts/tests/test_instrumentation.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.middleware.instrumentation import RequestMetrics, current, install
+
+from ..models import Post
+
+User = get_user_model()
+
+RECORDS = list()
+
+
+def collect(metrics):
+    RECORDS.append(metrics)
+
+
+@override_settings(
+    REQUEST_METRICS_SAMPLE_RATE=1,
+    REQUEST_METRICS_SINK='posts.tests.test_instrumentation.collect',
+)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        RECORDS.clear()
+        author = User.objects.create_user(username='Author')
+        Post.objects.create(author=author, text='Тестовый пост')
+        self.client = Client()
+
+    def test_request_metrics(self):
+        """замер содержит страницу, SQL, шаблоны и кэш"""
+        url = reverse('posts:index')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        # журнал запросов очищается в начале каждого запроса к серверу
+        queries = len(context.captured_queries)
+        self.client.get(url)
+        self.assertEqual(len(RECORDS), 2)
+        first, second = RECORDS
+        self.assertEqual(first['view'], 'posts:index')
+        self.assertEqual(first['status'], 200)
+        self.assertEqual(first['sql_count'], queries)
+        self.assertGreater(first['template_ms'], 0)
+        self.assertGreaterEqual(first['duration_ms'], first['sql_ms'])
+        self.assertGreater(first['cache_misses'], 0)
+        # вторая страница берется из кэша
+        self.assertGreater(second['cache_hits'], 0)
+        self.assertLess(second['sql_count'], first['sql_count'])
+
+    def test_cache_get_many(self):
+        """каждый ключ get_many считается один раз"""
+        install()
+        cache.set('first', 1)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        try:
+            self.assertEqual(
+                cache.get_many(key for key in ('first', 'second', 'third')),
+                {'first': 1}
+            )
+            cache.get('first')
+        finally:
+            current.reset(token)
+        self.assertEqual(metrics.cache_hits, 2)
+        self.assertEqual(metrics.cache_misses, 2)
+
+    def test_unresolved_path(self):
+        """у несуществующей страницы нет имени view"""
+        self.client.get('/nowhere/')
+        self.assertEqual(RECORDS[0]['view'], None)
+        self.assertEqual(RECORDS[0]['status'], 404)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_disabled(self):
+        """при нулевой доле замеров нет"""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(RECORDS, [])
+
+    @override_settings(REQUEST_METRICS_DUPLICATE_THRESHOLD=3)
+    def test_duplicates(self):
+        """запрос, повторенный не меньше порога, попадает в отчет"""
+        metrics = RequestMetrics()
+
+        def execute(sql, params, many, context):
+            return None
+
+        for pk in range(3):
+            metrics.execute(execute, 'SELECT %s', (pk,), False, None)
+        metrics.execute(execute, 'SELECT 1', (), False, None)
+        self.assertEqual(metrics.sql_count, 4)
+        self.assertEqual(
+            metrics.duplicates(), [{'sql': 'SELECT %s', 'count': 3}]
+        )
@@ -0,0 +1,139 @@
+# posts/tests/test_pagecache.py
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import pagecache
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.other = User.objects.create_user(username='Other')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Пост автора', group=self.group
+        )
+        self.other_post = Post.objects.create(
+            author=self.other, text='Пост другого автора'
+        )
+        self.guest_client = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+            'other_profile': reverse(
+                'posts:profile', kwargs={'username': self.other.username}
+            ),
+            'other_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.other_post.pk}
+            ),
+        }
+
+    def warm(self):
+        for url in self.urls.values():
+            self.assertEqual(self.guest_client.get(url).status_code, 200)
+
+    def cached(self):
+        """страницы, которые сейчас отдаются из кэша"""
+        names = set()
+        for name, url in self.urls.items():
+            response = self.guest_client.get(url)
+            if not response.templates:
+                names.add(name)
+        self.warm()
+        return names
+
+    def test_served_from_cache(self):
+        """повторная страница отдается без запросов и рендеринга"""
+        self.warm()
+        for name, url in self.urls.items():
+            with self.subTest(name=name):
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.templates, [])
+                self.assertEqual(response.status_code, 200)
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_post_edit(self):
+        """правка поста сбрасывает только страницы с ним"""
+        self.warm()
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertEqual(self.cached(), {'other_profile', 'other_detail'})
+
+    def test_new_post(self):
+        """новый пост сбрасывает ленты, куда он попал"""
+        self.warm()
+        Post.objects.create(author=self.other, text='Новый пост')
+        self.assertEqual(
+            self.cached(), {'group_list', 'profile', 'post_detail'}
+        )
+        response = self.guest_client.get(self.urls['other_profile'])
+        self.assertContains(response, 'Новый пост')
+
+    def test_comment(self):
+        """комментарий меняет страницы, где видна карточка поста"""
+        self.warm()
+        Comment.objects.create(
+            post=self.post, author=self.other, text='Комментарий'
+        )
+        self.assertEqual(self.cached(), {'other_profile', 'other_detail'})
+
+    def test_group_and_follow(self):
+        """группа и подписка сбрасывают свои страницы"""
+        self.warm()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertEqual(
+            self.cached(), {'other_profile', 'other_detail'}
+        )
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertEqual(
+            self.cached(),
+            {'index', 'group_list', 'post_detail', 'other_detail'}
+        )
+
+    def test_authorized_not_cached(self):
+        """страницы пользователей не кэшируются"""
+        client = Client()
+        client.force_login(self.other)
+        client.get(self.urls['index'])
+        response = client.get(self.urls['index'])
+        self.assertNotEqual(response.templates, [])
+
+    def test_changed_while_rendering(self):
+        """страница, чей пост изменился во время сборки, не кэшируется"""
+        depends = pagecache.depends
+
+        def depends_and_edit(request, *tags):
+            depends(request, *tags)
+            pagecache.invalidate(pagecache.post_tag(self.post.pk))
+
+        url = self.urls['post_detail']
+        with mock.patch.object(pagecache, 'depends', depends_and_edit):
+            self.guest_client.get(url)
+        self.assertNotEqual(self.guest_client.get(url).templates, [])
+        self.assertEqual(self.guest_client.get(url).templates, [])
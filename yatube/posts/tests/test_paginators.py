@@ -0,0 +1,127 @@
+# posts/tests/test_paginators.py
+import datetime as dt
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..paginators import (CursorPage, CursorPaginator, decode_cursor,
+                          encode_cursor)
+
+User = get_user_model()
+
+POSTS_COUNT = settings.PAGINATOR_PER_PAGE * 2 + 3
+
+
+@override_settings(PAGINATOR_CURSOR_VIEWS=('index', 'profile'))
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        # у части постов одинаковая дата - порядок должен держаться на pk
+        now = timezone.now()
+        cls.posts = Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text='Пост №' + str(num),
+                pub_date=now - dt.timedelta(minutes=num // 2),
+            ) for num in range(POSTS_COUNT)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def walk(self, url):
+        """Проходит ленту курсором вперед, возвращает pk по страницам"""
+        pages = list()
+        response = self.guest_client.get(url)
+        while True:
+            page_obj = response.context['page_obj']
+            self.assertIsInstance(page_obj, CursorPage)
+            pages.append([post.pk for post in page_obj])
+            if not page_obj.has_next():
+                return pages, page_obj
+            response = self.guest_client.get(
+                url, {'after': page_obj.next_cursor}
+            )
+
+    def test_cursor_walk_forward(self):
+        """курсор вперед отдает все посты без пропусков и повторов"""
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        ):
+            with self.subTest(url=url):
+                pages, _ = self.walk(url)
+                self.assertEqual(sum(pages, []), self.expected)
+                self.assertEqual(
+                    [len(page) for page in pages],
+                    [settings.PAGINATOR_PER_PAGE] * 2 + [3]
+                )
+
+    def test_cursor_walk_backward(self):
+        """курсор назад возвращает на предыдущие страницы"""
+        url = reverse('posts:index')
+        pages, page_obj = self.walk(url)
+        self.assertTrue(page_obj.has_previous())
+        response = self.guest_client.get(
+            url, {'before': page_obj.previous_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual([post.pk for post in page_obj], pages[-2])
+        self.assertTrue(page_obj.has_next())
+        response = self.guest_client.get(
+            url, {'before': page_obj.previous_cursor}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual([post.pk for post in page_obj], pages[0])
+        self.assertFalse(page_obj.has_previous())
+
+    def test_cursor_no_count_query(self):
+        """страница курсора - один запрос к постам без COUNT и OFFSET"""
+        post = Post.objects.get(pk=self.expected[15])
+        paginator = CursorPaginator(
+            Post.objects.all(), settings.PAGINATOR_PER_PAGE
+        )
+        with CaptureQueriesContext(connection) as context:
+            page_obj = paginator.get_cursor_page(after=encode_cursor(post))
+        self.assertEqual(len(context.captured_queries), 1)
+        sql = context.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertEqual(
+            [post.pk for post in page_obj], self.expected[16:]
+        )
+
+    def test_cursor_bad_token(self):
+        """битый токен не роняет страницу, а открывает начало ленты"""
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'not-a-cursor'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[:settings.PAGINATOR_PER_PAGE]
+        )
+
+    def test_numbered_pages_not_opted_in(self):
+        """ленты без опции продолжают листаться по номерам страниц"""
+        with self.settings(PAGINATOR_CURSOR_VIEWS=()):
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(hasattr(response.context['page_obj'], 'is_cursor'))
+        self.assertEqual(
+            response.context['page_obj'].paginator.count, POSTS_COUNT
+        )
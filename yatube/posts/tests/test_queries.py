@@ -0,0 +1,107 @@
+# posts/tests/test_queries.py
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+from ..timeline import rebuild_timelines
+
+User = get_user_model()
+
+POSTS_COUNT = 30
+
+# бюджет запросов на страницу ленты, не зависящий от размера страницы:
+# ключ - url name, значение - число запросов для авторизованного клиента
+# (сессия и пользователь + запросы самой ленты); у всех постов есть
+# картинки, и готовность их миниатюр проверяется одним запросом на страницу
+FEED_QUERY_BUDGET = {
+    # COUNT + SELECT постов + миниатюры
+    'index': 5,
+    # группа + COUNT + SELECT постов + миниатюры
+    'group_list': 6,
+    # автор + COUNT + SELECT постов + проверка подписки + миниатюры
+    'profile': 7,
+    # авторы-знаменитости (кэш очищен) + COUNT + SELECT ленты + миниатюры
+    'follow_index': 6,
+}
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        # у каждого поста свой автор, чтобы N+1 по авторам был заметен
+        authors = [
+            User.objects.create_user(
+                username='Author' + str(num),
+                first_name='Имя' + str(num),
+            ) for num in range(POSTS_COUNT)
+        ]
+        Post.objects.bulk_create(
+            Post(
+                author=author,
+                text='Тестовый пост №' + str(num),
+                group=cls.group,
+                # файлы не нужны: миниатюр нет, и карточки ведут на оригинал
+                image=f'posts/post{num}.gif',
+            ) for num, author in enumerate(authors)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author) for author in authors
+        )
+        # bulk_create не вызывает сигналов - ленту подписок строим явно
+        rebuild_timelines()
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': authors[0].username}
+            ),
+            'follow_index': reverse('posts:follow_index'),
+        }
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTests.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_feed_query_budget(self):
+        """число запросов ленты фиксировано и не растет с размером страницы"""
+        for per_page in (1, 10, POSTS_COUNT):
+            for name, url in FeedQueriesTests.urls.items():
+                with self.subTest(url=url, per_page=per_page):
+                    with self.settings(PAGINATOR_PER_PAGE=per_page):
+                        self.assertEqual(
+                            self.count_queries(url),
+                            FEED_QUERY_BUDGET[name],
+                            f'Лента {url} превышает бюджет запросов'
+                        )
+
+    def test_cursor_feed_query_budget(self):
+        """в курсорном режиме лента обходится без COUNT(*)"""
+        with self.settings(
+            PAGINATOR_CURSOR_VIEWS=tuple(FEED_QUERY_BUDGET),
+            PAGINATOR_PER_PAGE=10
+        ):
+            for name, url in FeedQueriesTests.urls.items():
+                with self.subTest(url=url):
+                    self.assertEqual(
+                        self.count_queries(url), FEED_QUERY_BUDGET[name] - 1
+                    )
@@ -0,0 +1,148 @@
+# posts/tests/test_routers.py
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import routers
+from core.middleware.replicas import PIN_COOKIE, ReplicaPinMiddleware
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def read(self, state):
+        token = routers.current.set(state)
+        try:
+            return self.router.db_for_read(Post)
+        finally:
+            routers.current.reset(token)
+
+    def test_reads(self):
+        """чтения запроса идут в реплики, вне запроса - в основную базу"""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertIn(
+            self.read(routers.RequestState()), ['replica1', 'replica2']
+        )
+        self.assertEqual(
+            self.read(routers.RequestState(pinned=True)), 'default'
+        )
+
+    def test_read_your_writes(self):
+        """после записи запрос читает из основной базы"""
+        state = routers.RequestState()
+        token = routers.current.set(state)
+        try:
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        finally:
+            routers.current.reset(token)
+        self.assertTrue(state.wrote)
+        self.assertEqual(self.read(state), 'default')
+
+    def test_migrate(self):
+        """миграции не применяются к репликам"""
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_PIN_SECONDS=5)
+class ReplicaPinMiddlewareTests(TestCase):
+    def middleware(self, write=False):
+        def view(request):
+            if write:
+                routers.ReplicaRouter().db_for_write(Post)
+            self.state = routers.current.get()
+            return HttpResponse()
+        return ReplicaPinMiddleware(view)
+
+    def test_pin_after_write(self):
+        """запись закрепляет чтения браузера cookie на короткое время"""
+        request = RequestFactory().post('/')
+        response = self.middleware(write=True)(request)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        self.assertIsNone(routers.current.get())
+
+    def test_read_only(self):
+        """запрос без записей cookie не ставит"""
+        response = self.middleware()(RequestFactory().get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertFalse(self.state.pinned)
+
+    def test_pinned(self):
+        """с cookie чтения идут в основную базу"""
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.middleware()(request)
+        self.assertTrue(self.state.pinned)
+
+    def test_not_used_without_replicas(self):
+        """без реплик middleware исключается из цепочки"""
+        with override_settings(DATABASE_REPLICAS=[]):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaPinMiddleware(lambda request: HttpResponse())
+
+
+# реплика - сама основная база: считаем, сколько чтений ушло в реплику
+@override_settings(DATABASE_REPLICAS=['default'], PAGE_CACHE_TIMEOUT=0)
+class ReplicaFlowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Author')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def replica_reads(self, *args, **kwargs):
+        with mock.patch.object(
+            routers.random, 'choice', wraps=routers.random.choice
+        ) as choice:
+            response = self.client.get(*args, **kwargs)
+        return response, choice.call_count
+
+    def test_author_sees_new_post(self):
+        """после публикации профиль автора читается из основной базы"""
+        profile = reverse('posts:profile', kwargs={'username': 'Author'})
+        response, reads = self.replica_reads(profile)
+        self.assertGreater(reads, 0)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response, reads = self.replica_reads(profile)
+        self.assertEqual(reads, 0)
+        self.assertContains(response, 'Новый пост')
+        self.client.cookies.pop(PIN_COOKIE)
+        response, reads = self.replica_reads(profile)
+        self.assertGreater(reads, 0)
+
+    def test_index_after_change(self):
+        """фрагмент главной после смены поколения собирается из основной"""
+        Post.objects.create(author=self.author, text='Новый пост')
+        anonymous = Client()
+        with mock.patch.object(
+            routers.random, 'choice', wraps=routers.random.choice
+        ) as choice:
+            anonymous.get(reverse('posts:index'))
+            self.assertEqual(choice.call_count, 0)
+            with self.settings(DATABASE_PIN_SECONDS=0):
+                anonymous.get(reverse('posts:index'))
+            self.assertGreater(choice.call_count, 0)
+
+    def test_page_cache_fill(self):
+        """страница для кэша страниц собирается из основной базы"""
+        profile = reverse('posts:profile', kwargs={'username': 'Author'})
+        with self.settings(PAGE_CACHE_TIMEOUT=60):
+            with mock.patch.object(
+                routers.random, 'choice', wraps=routers.random.choice
+            ) as choice:
+                Client().get(profile)
+        self.assertEqual(choice.call_count, 0)
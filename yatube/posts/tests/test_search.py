@@ -0,0 +1,144 @@
+# posts/tests/test_search.py
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..search import SearchResults, fts5_supported
+from ..stemmer import stem, tokenize
+
+User = get_user_model()
+
+
+class StemmerTests(SimpleTestCase):
+    def test_stem(self):
+        """основы слов по алгоритму Snowball"""
+        for word, expected in (
+            ('книгами', 'книг'),
+            ('книга', 'книг'),
+            ('важнейшие', 'важн'),
+            ('программирование', 'программирован'),
+            ('возможность', 'возможн'),
+            ('одеваться', 'одева'),
+            ('пробежавшись', 'пробежа'),
+            ('django', 'django'),
+        ):
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_tokenize(self):
+        """регистр, буква ё и знаки препинания не мешают поиску"""
+        self.assertEqual(
+            tokenize('Ёлки-палки, Django_2 и 2021!'),
+            ['елк', 'палк', 'django', '2', 'и', '2021']
+        )
+
+
+class SearchBackendMixin:
+    """Тесты, общие для обоих поисковых индексов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=text) for text in (
+                'Читаю интересные книги по программированию',
+                'Книга о книгах: книги, книгами, книжный червь',
+                'Программирование на Python и немного о книге',
+                'Прогулка по осеннему лесу',
+            )
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def found(self, query):
+        results = SearchResults(query)
+        return [post.pk for post in results[:results.count()]]
+
+    def test_word_forms(self):
+        """поиск находит другие формы слова"""
+        self.assertCountEqual(
+            self.found('книгами'),
+            [self.posts[0].pk, self.posts[1].pk, self.posts[2].pk]
+        )
+        self.assertEqual(self.found('ЛЕСА'), [self.posts[3].pk])
+
+    def test_all_terms_required(self):
+        """пост должен содержать все слова запроса"""
+        self.assertCountEqual(
+            self.found('книга программирование'),
+            [self.posts[0].pk, self.posts[2].pk]
+        )
+        self.assertEqual(self.found('книга лес'), [])
+        self.assertEqual(self.found(''), [])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_bm25_ranking(self):
+        """чаще упоминающий слово пост идет первым"""
+        self.assertEqual(self.found('книга')[0], self.posts[1].pk)
+
+    def test_incremental_update(self):
+        """правка и удаление поста сразу видны в поиске"""
+        post = self.posts[3]
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Прогулка по зимнему парку'}
+        )
+        self.assertEqual(self.found('лес'), [])
+        self.assertEqual(self.found('парки'), [post.pk])
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.found('парк'), [])
+        created = Post.objects.create(author=self.author, text='Новый парк')
+        self.assertEqual(self.found('парк'), [created.pk])
+
+    def test_reindex_command(self):
+        """reindex_posts подхватывает изменения в обход сигналов"""
+        Post.objects.filter(pk=self.posts[3].pk).update(text='Морской берег')
+        self.assertEqual(self.found('берег'), [])
+        out = StringIO()
+        call_command('reindex_posts', batch_size=2, stdout=out)
+        self.assertIn('проиндексировано постов 4', out.getvalue())
+        self.assertEqual(self.found('берега'), [self.posts[3].pk])
+        self.assertEqual(self.found('лес'), [])
+
+    def test_search_page(self):
+        """страница поиска показывает результаты и сохраняет запрос"""
+        with self.settings(PAGINATOR_PER_PAGE=2):
+            response = self.guest_client.get(
+                reverse('posts:search'), {'q': 'книги'}
+            )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 3)
+        self.assertEqual(len(page_obj), 2)
+        self.assertEqual(response.context['query'], 'книги')
+        self.assertContains(response, 'href="?q=%D0%BA%D0%BD%D0%B8%D0%B3'
+                                      '%D0%B8&amp;page=2"')
+        response = self.guest_client.get(reverse('posts:search'))
+        self.assertNotContains(response, 'Найдено постов')
+
+
+@override_settings(POST_SEARCH_BACKEND='table')
+class TableSearchTests(SearchBackendMixin, TestCase):
+    pass
+
+
+@skipUnless(fts5_supported(), 'SQLite собран без FTS5')
+@override_settings(POST_SEARCH_BACKEND='fts5')
+class Fts5SearchTests(SearchBackendMixin, TestCase):
+    def test_same_ranking(self):
+        """FTS5 и табличный индекс ранжируют одинаково"""
+        for query in ('книга', 'программирование', 'книга программирование'):
+            fts5 = self.found(query)
+            with self.settings(POST_SEARCH_BACKEND='table'):
+                call_command('reindex_posts', stdout=StringIO())
+                table = self.found(query)
+            with self.subTest(query=query):
+                self.assertEqual(fts5, table)
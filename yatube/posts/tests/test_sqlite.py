@@ -0,0 +1,83 @@
+# posts/tests/test_sqlite.py
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+from core.sqlite import apply_pragmas, configure_connection
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+PROFILES = {
+    'default': {},
+    'production': {
+        'busy_timeout': 1234,
+        'synchronous': 'NORMAL',
+        'cache_size': -1024,
+    },
+}
+
+
+def pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+# synchronous нельзя менять внутри транзакции, а копия базы для замера
+# не снимается с соединения, у которого открыта транзакция TestCase
+@override_settings(SQLITE_PROFILES=PROFILES)
+class SqliteProfileTests(TransactionTestCase):
+    def setUp(self):
+        self.original = {
+            name: pragma(name) for name in PROFILES['production']
+        }
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, self.original)
+
+    def configure(self, name):
+        with override_settings(SQLITE_PROFILE=name):
+            configure_connection(None, connection)
+
+    def test_production_profile(self):
+        """профиль применяется к новому соединению"""
+        self.configure('production')
+        self.assertEqual(pragma('busy_timeout'), 1234)
+        # NORMAL
+        self.assertEqual(pragma('synchronous'), 1)
+        self.assertEqual(pragma('cache_size'), -1024)
+
+    def test_default_profile(self):
+        """профиль по умолчанию ничего не меняет"""
+        self.configure('default')
+        self.assertEqual(
+            {name: pragma(name) for name in self.original}, self.original
+        )
+
+    def test_maintenance(self):
+        """команда обслуживания отчитывается о журнале и очистке"""
+        out = StringIO()
+        call_command('sqlite_maintenance', stdout=out)
+        self.assertIn('journal_mode', out.getvalue())
+        self.assertIn('освобождено страниц 0', out.getvalue())
+
+    def test_bench_sqlite(self):
+        """замер гоняет нагрузку на копии базы для каждого профиля"""
+        author = User.objects.create_user(username='Author')
+        for num in range(5):
+            Post.objects.create(author=author, text=f'Пост {num}')
+        out = StringIO()
+        call_command(
+            'bench_sqlite', seconds=0.2, threads=2, write_ratio=0.5,
+            stdout=out
+        )
+        self.assertIn('default: чтений', out.getvalue())
+        self.assertIn('production: чтений', out.getvalue())
+        self.assertNotRegex(out.getvalue(), r'ошибок [1-9]')
+        self.assertEqual(Comment.objects.count(), 0)
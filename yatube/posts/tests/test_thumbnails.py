@@ -0,0 +1,269 @@
+# posts/tests/test_thumbnails.py
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail.models import KVStore
+
+from .. import thumbnails
+from ..models import Post
+from ..thumbnails import (ThumbnailPool, Trash, generate_thumbnails, pool,
+                          prefetch_thumbnails, ready_thumbnail)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+# фоновые потоки пишут в хранилище ключей sorl через свое соединение,
+# поэтому тесты не должны держать открытую транзакцию
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPoolTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        # миниатюры в этих тестах генерирует сам тест
+        with mock.patch.object(thumbnails, 'schedule'):
+            self.post.image.save('pool.gif', uploaded())
+        self.guest_client = Client()
+
+    def test_fallback_to_original(self):
+        """пока миниатюры нет, страницы показывают оригинал картинки"""
+        self.assertIsNone(ready_thumbnail(self.post.image, 'card'))
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url),
+                    f'<img class="card-img my-2" src="{self.post.image.url}">'
+                )
+        self.assertIsNone(ready_thumbnail(self.post.image, 'card'))
+
+    def test_pool_generates_thumbnail(self):
+        """пул генерирует миниатюру и сбрасывает кэш главной"""
+        thumbnail_pool = ThumbnailPool(workers=2)
+        self.guest_client.get(reverse('posts:index'))
+        thumbnail_pool.submit(
+            generate_thumbnails, self.post.pk, self.post.image.name
+        )
+        thumbnail_pool.join()
+        thumbnail = ready_thumbnail(self.post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')),
+            f'<img class="card-img my-2" src="{thumbnail.url}">'
+        )
+
+    def test_prefetch_thumbnails(self):
+        """готовность миниатюр страницы проверяется одним запросом"""
+        generate_thumbnails(self.post.pk, self.post.image.name)
+        thumbnail = ready_thumbnail(self.post.image, 'card')
+        cache.clear()
+        posts = [Post.objects.get(pk=self.post.pk) for _ in range(3)]
+        missing = Post(author=self.user, image='posts/missing.gif')
+        with CaptureQueriesContext(connection) as context:
+            prefetch_thumbnails(
+                [post.image for post in posts + [missing]], 'card'
+            )
+            ready = [ready_thumbnail(post.image, 'card') for post in posts]
+            self.assertIsNone(ready_thumbnail(missing.image, 'card'))
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual([image.url for image in ready], [thumbnail.url] * 3)
+        # промахи запомнены в кэше sorl, как и при обычной проверке
+        with CaptureQueriesContext(connection) as context:
+            prefetch_thumbnails([missing.image], 'card')
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_pool_survives_bad_image(self):
+        """битая картинка не останавливает рабочие потоки"""
+        thumbnail_pool = ThumbnailPool(workers=1)
+        thumbnail_pool.submit(
+            generate_thumbnails, self.post.pk, 'posts/missing.gif'
+        )
+        thumbnail_pool.submit(
+            generate_thumbnails, self.post.pk, self.post.image.name
+        )
+        thumbnail_pool.join()
+        self.assertIsNotNone(ready_thumbnail(self.post.image, 'card'))
+
+    def test_pool_survives_connection_errors(self):
+        """ошибка при закрытии соединений не останавливает рабочий поток"""
+        thumbnail_pool = ThumbnailPool(workers=1)
+        second = threading.Event()
+        with mock.patch.object(
+            thumbnails, 'close_old_connections', side_effect=RuntimeError
+        ):
+            thumbnail_pool.submit(lambda: None)
+            thumbnail_pool.submit(second.set)
+            self.assertTrue(second.wait(5))
+            thumbnail_pool.join()
+
+    def test_saved_image_schedules_thumbnail(self):
+        """картинка из админки или shell тоже получает миниатюру"""
+        post = Post.objects.create(author=self.user, text='Из shell')
+        with mock.patch.object(pool, 'workers', 0):
+            post.image.save('shell.gif', uploaded())
+        self.assertIsNotNone(ready_thumbnail(post.image, 'card'))
+
+    def test_post_create_schedules_thumbnail(self):
+        """post_create ставит миниатюру в очередь после коммита"""
+        client = Client()
+        client.force_login(self.user)
+        # задача выполняется в потоке запроса, как в ImageCleanupTests
+        with mock.patch.object(pool, 'workers', 0):
+            client.post(
+                reverse('posts:post_create'),
+                {'text': 'Пост с картинкой', 'image': uploaded('created.gif')}
+            )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertIsNotNone(ready_thumbnail(post.image, 'card'))
+
+
+# тестовая база SQLite в памяти не ждет блокировок, поэтому задачи пула
+# выполняются сразу в потоке теста или запроса
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch.object(pool, 'workers', 0)
+class ImageCleanupTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Author')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, name):
+        post = Post.objects.create(author=self.user, text='Пост')
+        # миниатюры ставит в очередь сигнал post_save
+        post.image.save(name, uploaded())
+        return post
+
+    def thumbnail_path(self, post):
+        thumbnail = ready_thumbnail(post.image, 'card')
+        return thumbnail.storage.path(thumbnail.name)
+
+    def test_save_without_select(self):
+        """сохранение поста не перечитывает его строку из базы"""
+        post = Post.objects.get(pk=self.create_post('keep.gif').pk)
+        post.text = 'Новый текст'
+        with CaptureQueriesContext(connection) as context:
+            post.save()
+        self.assertFalse([
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and '"posts_post"."image"' in query['sql']
+        ])
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_replaced_image_deleted(self):
+        """замененная картинка удаляется вместе с миниатюрой"""
+        post = self.create_post('old.gif')
+        old_path = post.image.path
+        old_thumbnail = self.thumbnail_path(post)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Пост', 'image': uploaded('new.gif')}
+        )
+        post.refresh_from_db()
+        self.assertFalse(os.path.exists(old_path))
+        self.assertFalse(os.path.exists(old_thumbnail))
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertIsNotNone(ready_thumbnail(post.image, 'card'))
+
+    def test_rollback_keeps_image(self):
+        """при откате транзакции старая картинка остается на месте"""
+        post = Post.objects.get(pk=self.create_post('kept.gif').pk)
+        old_path = post.image.path
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                post.image = None
+                post.save()
+                raise RuntimeError
+        self.assertTrue(os.path.exists(old_path))
+
+    def test_bulk_delete(self):
+        """массовое удаление постов удаляет все картинки и ключи sorl"""
+        posts = [self.create_post(f'bulk{num}.gif') for num in range(5)]
+        paths = [post.image.path for post in posts]
+        paths += [self.thumbnail_path(post) for post in posts]
+        Post.objects.all().delete()
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertFalse(os.path.exists(path))
+        self.assertFalse(KVStore.objects.exists())
+
+    def test_bulk_delete_single_query(self):
+        """ключи sorl пачки картинок удаляются одним запросом"""
+        posts = [self.create_post(f'batch{num}.gif') for num in range(5)]
+        names = [post.image.name for post in posts]
+        Post.objects.filter(pk__in=[post.pk for post in posts]).update(
+            image=''
+        )
+        trash = Trash(ThumbnailPool(workers=0))
+        with CaptureQueriesContext(connection) as context:
+            trash.add(names)
+        deletes = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('DELETE')
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertFalse(KVStore.objects.exists())
+
+    def test_edit_storm(self):
+        """после серии правок остается только последняя картинка"""
+        media_root = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        with self.settings(MEDIA_ROOT=media_root):
+            post = self.create_post('storm.gif')
+            for num in range(10):
+                self.authorized_client.post(
+                    reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                    {'text': f'Правка №{num}', 'image': uploaded(f'{num}.gif')}
+                )
+            post.refresh_from_db()
+            thumbnail = ready_thumbnail(post.image, 'card')
+            self.assertIsNotNone(thumbnail)
+            files = [
+                os.path.join(path, name)
+                for path, _, names in os.walk(media_root)
+                for name in names
+            ]
+            self.assertCountEqual(files, [
+                post.image.path, thumbnail.storage.path(thumbnail.name)
+            ])
+        self.assertEqual(KVStore.objects.count(), 3)
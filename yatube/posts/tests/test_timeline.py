@@ -0,0 +1,261 @@
+# posts/tests/test_timeline.py
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='Author')
+        self.other = User.objects.create_user(username='Other')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def timeline(self, user=None):
+        return list(
+            TimelineEntry.objects.filter(
+                user=user or self.reader
+            ).values_list('post_id', flat=True)
+        )
+
+    def test_fan_out_on_create(self):
+        """новый пост попадает в ленты всех подписчиков автора"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        Post.objects.create(author=self.other, text='Чужой пост')
+        self.assertEqual(self.timeline(), [post.pk])
+        self.assertEqual(self.timeline(self.other), [post.pk])
+
+    def test_backfill_and_remove(self):
+        """подписка добавляет прошлые посты автора, отписка убирает их"""
+        posts = [
+            Post.objects.create(author=self.author, text='Пост ' + str(num))
+            for num in range(3)
+        ]
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Author'})
+        )
+        self.assertCountEqual(self.timeline(), [post.pk for post in posts])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Author'})
+        )
+        self.assertEqual(self.timeline(), [])
+
+    @override_settings(TIMELINE_MAX_LENGTH=3)
+    def test_trim(self):
+        """лента обрезается до TIMELINE_MAX_LENGTH самых новых постов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=str(num))
+            for num in range(5)
+        ]
+        self.assertEqual(
+            self.timeline(), [post.pk for post in reversed(posts[2:])]
+        )
+
+    @override_settings(TIMELINE_MAX_LENGTH=3)
+    def test_trim_without_aggregate(self):
+        """публикация обрезает ленты подписчиков без агрегата по ним"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        for num in range(3):
+            Post.objects.create(author=self.author, text=str(num))
+        with CaptureQueriesContext(connection) as context:
+            post = Post.objects.create(author=self.author, text='Новый')
+        for user in (self.reader, self.other):
+            with self.subTest(user=user.username):
+                timeline = self.timeline(user)
+                self.assertEqual(len(timeline), 3)
+                self.assertEqual(timeline[0], post.pk)
+        self.assertFalse(any(
+            'GROUP BY' in query['sql'] for query in context.captured_queries
+        ))
+
+    def test_pub_date_change(self):
+        """смена даты публикации поста переносится в ленту"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.pub_date = timezone.now() - dt.timedelta(days=1)
+        post.save()
+        self.assertEqual(
+            TimelineEntry.objects.get(post=post).pub_date, post.pub_date
+        )
+
+    def test_rebuild_command(self):
+        """команда rebuild_timelines восстанавливает ленты по подпискам"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост ' + str(num))
+            for num in range(3)
+        )
+        TimelineEntry.objects.create(
+            user=self.other,
+            post=Post.objects.first(),
+            pub_date=timezone.now()
+        )
+        out = StringIO()
+        call_command('rebuild_timelines', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(len(self.timeline()), 3)
+        self.assertEqual(self.timeline(self.other), [])
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_rebuild_keeps_latest(self):
+        """перестроенная лента - последние посты с их датами"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        now = timezone.now()
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(num),
+                 pub_date=now - dt.timedelta(days=num))
+            for num in range(4)
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        expected = Post.objects.order_by('-pub_date')[:2]
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader)
+                 .values_list('post_id', 'pub_date')),
+            [(post.pk, post.pub_date) for post in expected]
+        )
+
+    @override_settings(PAGINATOR_CURSOR_VIEWS=('follow_index',))
+    def test_follow_index_cursor(self):
+        """лента подписок листается курсором по записям ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        now = timezone.now()
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(num), pub_date=now)
+            for num in range(15)
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        page_obj = response.context['page_obj']
+        first = [post.pk for post in page_obj]
+        response = self.authorized_client.get(
+            url, {'after': page_obj.next_cursor}
+        )
+        second = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(first + second, expected)
+
+
+@override_settings(TIMELINE_FANOUT_THRESHOLD=2)
+class HybridTimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.fan = User.objects.create_user(username='Fan')
+        self.author = User.objects.create_user(username='Author')
+        self.celebrity = User.objects.create_user(username='Celebrity')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        Follow.objects.create(user=self.fan, author=self.celebrity)
+        cache.clear()
+        self.posts = list()
+        for num in range(12):
+            author = self.celebrity if num % 3 else self.author
+            self.posts.append(
+                Post.objects.create(author=author, text='Пост ' + str(num))
+            )
+        self.posts.reverse()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_no_fan_out_for_celebrity(self):
+        """посты автора выше порога не раскладываются по лентам"""
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                post__author=self.celebrity
+            ).exists()
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 4
+        )
+
+    def test_merged_follow_index(self):
+        """лента подписок сливает свою ленту и посты знаменитостей"""
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        first = [post.pk for post in response.context['page_obj']]
+        response = self.authorized_client.get(url, {'page': 2})
+        second = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(first + second, [post.pk for post in self.posts])
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+    def test_merged_follow_index_cursor(self):
+        """слияние лент работает и при курсорной пагинации"""
+        url = reverse('posts:follow_index')
+        with self.settings(PAGINATOR_CURSOR_VIEWS=('follow_index',)):
+            page_obj = self.authorized_client.get(url).context['page_obj']
+            first = [post.pk for post in page_obj]
+            page_obj = self.authorized_client.get(
+                url, {'after': page_obj.next_cursor}
+            ).context['page_obj']
+            self.assertEqual(
+                first + [post.pk for post in page_obj],
+                [post.pk for post in self.posts]
+            )
+            page_obj = self.authorized_client.get(
+                url, {'before': page_obj.previous_cursor}
+            ).context['page_obj']
+            self.assertEqual([post.pk for post in page_obj], first)
+
+    def test_no_duplicates_after_threshold(self):
+        """пост, попавший в ленту до перехода порога, не дублируется"""
+        TimelineEntry.objects.create(
+            user=self.reader,
+            post=self.posts[1],
+            pub_date=self.posts[1].pub_date
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        pks = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(len(pks), len(set(pks)))
+        self.assertEqual(pks, [post.pk for post in self.posts[:10]])
+
+    def test_backfill_below_threshold(self):
+        """опустившись ниже порога, автор приносит посты в ленты"""
+        Follow.objects.filter(user=self.fan, author=self.celebrity).delete()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 12
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        Post.objects.create(author=self.celebrity, text='Новый пост')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 13
+        )
+
+    def test_rebuild_after_threshold_change(self):
+        """перестройка лент не верит устаревшему списку знаменитостей"""
+        self.authorized_client.get(reverse('posts:follow_index'))
+        with self.settings(TIMELINE_FANOUT_THRESHOLD=3):
+            call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 12
+        )
+
+    def test_benchmark_command(self):
+        """команда bench_follow_index печатает время и число запросов"""
+        out = StringIO()
+        call_command(
+            'bench_follow_index', 'Reader', '--requests', '3', stdout=out
+        )
+        self.assertIn('p95', out.getvalue())
@@ -0,0 +1,173 @@
+# posts/tests/test_transfer.py
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import thumbnails
+from ..models import AuthorCounters, Comment, Follow, Group, Post
+from ..search import SearchResults
+from ..timeline import follow_feed
+from ..transfer import Importer, export_records, read_jsonl, write_jsonl
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+# миниатюры генерируются сразу: фоновые потоки не видят данных
+# незакоммиченной транзакции теста
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch.object(thumbnails.pool, 'workers', 0)
+class TransferTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='Author')
+        self.reader = User.objects.create_user(username='Reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author, text='Пост с картинкой', group=self.group
+        )
+        self.post.image.save(
+            'transfer.gif',
+            SimpleUploadedFile('transfer.gif', SMALL_GIF, 'image/gif')
+        )
+        for num in range(4):
+            Post.objects.create(author=self.author, text=f'Пост №{num}')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        # даты из выгрузки должны сохраниться при загрузке
+        Post.objects.update(pub_date=timezone.now() - timedelta(days=30))
+        self.media_dir = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        os.makedirs(os.path.join(self.media_dir, 'posts'))
+        shutil.copy(
+            self.post.image.path,
+            os.path.join(self.media_dir, self.post.image.name)
+        )
+
+    def export(self):
+        stream = StringIO()
+        write_jsonl(export_records(), stream)
+        return stream.getvalue()
+
+    def wipe(self):
+        """очищает контент, как в новом окружении"""
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_jsonl_roundtrip(self):
+        """выгрузка и загрузка сохраняют связи, даты и картинки"""
+        pub_dates = sorted(Post.objects.values_list('pub_date', flat=True))
+        dump = self.export()
+        self.assertEqual(
+            [json.loads(line)['model'] for line in dump.splitlines()],
+            ['group'] + ['post'] * 5 + ['comment', 'follow']
+        )
+        self.wipe()
+        importer = Importer(batch_size=2, media_dir=self.media_dir)
+        importer.run(read_jsonl(StringIO(dump)))
+        self.assertEqual(
+            dict(importer.imported),
+            {'group': 1, 'post': 5, 'comment': 1, 'follow': 0}
+        )
+        self.assertEqual(importer.skipped['follow'], 1)
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.group.slug, 'slug')
+        self.assertEqual(post.comments.get().author, self.reader)
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image, 'card'))
+        self.assertEqual(
+            sorted(Post.objects.values_list('pub_date', flat=True)),
+            pub_dates
+        )
+        # то, что обычно делают сигналы
+        self.assertEqual(AuthorCounters.objects.get(user=self.author)
+                         .posts_count, 5)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(follow_feed(self.reader).count(), 5)
+        results = SearchResults('картинки')
+        self.assertEqual(results[:1], [post])
+
+    def test_batched_inserts(self):
+        """посты вставляются пачками по batch_size"""
+        dump = self.export()
+        self.wipe()
+        with CaptureQueriesContext(connection) as context:
+            Importer(batch_size=2).run(read_jsonl(StringIO(dump)))
+        inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "posts_post"')
+        ]
+        self.assertEqual(len(inserts), 3)
+
+    def test_csv_commands(self):
+        """команды выгрузки и загрузки CSV, с созданием пользователей"""
+        directory = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        call_command(
+            'export_content', directory, format='csv', stderr=StringIO()
+        )
+        self.assertCountEqual(
+            os.listdir(directory),
+            ['group.csv', 'post.csv', 'comment.csv', 'follow.csv']
+        )
+        self.wipe()
+        User.objects.all().delete()
+        out = StringIO()
+        call_command(
+            'import_content', directory, format='csv', create_users=True,
+            media_dir=self.media_dir, link=True, stdout=out
+        )
+        self.assertIn('post: загружено 5, пропущено 0', out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertTrue(Follow.objects.filter(
+            user__username='Reader', author__username='Author'
+        ).exists())
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(post.group.slug, 'slug')
+        self.assertFalse(post.author.has_usable_password())
+        # жесткая ссылка на файл исходного окружения
+        self.assertEqual(os.stat(post.image.path).st_nlink, 2)
+
+    def test_unknown_authors_skipped(self):
+        """записи неизвестных авторов пропускаются"""
+        dump = self.export()
+        self.wipe()
+        self.author.delete()
+        importer = Importer()
+        importer.run(read_jsonl(StringIO(dump)))
+        self.assertEqual(importer.skipped['post'], 5)
+        self.assertEqual(importer.skipped['comment'], 1)
+        self.assertFalse(Post.objects.exists())
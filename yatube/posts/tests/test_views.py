@@ -291,15 +291,8 @@ class TaskPagesTests(TestCase):
     def test_cash_index_pages(self):
         url_index = reverse('posts:index')
         response = self.guest_client.get(url_index)
-        post = Post.objects.create(
-            author=self.user2,
-            text='Тестовый пост',
-        )
-        date_posts = (dt.datetime.now()
-                      - dt.timedelta(days=1)
-                      )
-        post.pub_date = make_aware(date_posts)
-        post.save()
+        # update() не вызывает сигналов - страница должна остаться в кэше
+        Post.objects.filter(pk=self.posts[-1].pk).update(text='Тестовый пост')
         self.assertEqual(
             self.guest_client.get(url_index).content,
             response.content,
@@ -310,6 +303,35 @@ class TaskPagesTests(TestCase):
             response.content,
             f'Не работает кэш или страница {url_index}')
 
+    def test_cash_index_pages_by_page(self):
+        url_index = reverse('posts:index')
+        first_page = self.guest_client.get(url_index).content
+        self.assertNotEqual(
+            self.guest_client.get(url_index + '?page=2').content,
+            first_page,
+            'Кэш главной страницы не различает номера страниц')
+
+    def test_cash_index_pages_invalidation(self):
+        url_index = reverse('posts:index')
+        response = self.guest_client.get(url_index + '?page=2')
+        post = Post.objects.create(
+            author=self.user2,
+            text='Новый тестовый пост',
+        )
+        self.assertContains(
+            self.guest_client.get(url_index),
+            post.text,
+            msg_prefix='Новый пост не сбросил кэш главной страницы')
+        self.assertNotEqual(
+            self.guest_client.get(url_index + '?page=2').content,
+            response.content,
+            'Новый пост не сбросил кэш второй страницы')
+        post.delete()
+        self.assertNotContains(
+            self.guest_client.get(url_index),
+            post.text,
+            msg_prefix='Удаление поста не сбросило кэш главной страницы')
+
     def test_follow(self):
         url_follow = reverse(
             'posts:profile_follow',
@@ -0,0 +1,276 @@
+# posts/thumbnails.py
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore
+
+from . import pagecache
+from .caching import invalidate_index_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# генерация и удаление миниатюр одной картинки не должны пересекаться,
+# иначе миниатюра удаленной картинки останется сиротой
+LOCKS = tuple(threading.Lock() for _ in range(16))
+
+
+def _lock(name):
+    return LOCKS[hash(name) % len(LOCKS)]
+
+
+def thumbnail_options(image, alias):
+    """Геометрия и полный набор опций sorl для миниатюры alias.
+
+    Опции дополняются так же, как в ThumbnailBackend.get_thumbnail, иначе
+    имя файла миниатюры не совпадет с тем, что сгенерирует sorl.
+    """
+    geometry, options = settings.POST_THUMBNAILS[alias]
+    options = dict(options)
+    backend = default.backend
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(image))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return geometry, options
+
+
+def _thumbnail_file(image, alias):
+    # файл миниатюры: по его ключу sorl хранит ее в хранилище ключей
+    source = ImageFile(image)
+    geometry, options = thumbnail_options(source, alias)
+    name = default.backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def ready_thumbnail(image, alias):
+    """Готовая миниатюра картинки или None, если ее еще нет.
+
+    В отличие от тега {% thumbnail %} ничего не генерирует в потоке
+    запроса: только смотрит в хранилище ключей sorl или берет результат
+    prefetch_thumbnails.
+    """
+    prefetched = getattr(image, '_ready_thumbnails', {})
+    if alias in prefetched:
+        return prefetched[alias]
+    try:
+        return default.kvstore.get(_thumbnail_file(image, alias))
+    except Exception:
+        logger.exception('Не удалось проверить миниатюру %s', image)
+        return None
+
+
+def ready_thumbnails(names, alias):
+    """Готовые миниатюры картинок names: {имя: ImageFile или None}.
+
+    Ключи всех картинок ищутся разом: одним get_many в кэше sorl и одним
+    запросом к его таблице для промахов, а не запросом на картинку.
+    """
+    keys = dict()
+    for name in set(names):
+        try:
+            keys[add_prefix(_thumbnail_file(name, alias).key, 'image')] = name
+        except Exception:
+            logger.exception('Не удалось проверить миниатюру %s', name)
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {name: ready_thumbnail(name, alias) for name in names}
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    empty = cached_db_kvstore.EMPTY_VALUE
+    if missing:
+        found = dict(
+            KVStore.objects.filter(key__in=missing).values_list('key', 'value')
+        )
+        fetched = {key: found.get(key, empty) for key in missing}
+        # как и sorl, запоминаем и промахи, чтобы не искать их в базе снова
+        kvstore.cache.set_many(
+            fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return {
+        name: None if values[key] == empty
+        else deserialize_image_file(values[key])
+        for key, name in keys.items()
+    }
+
+
+def prefetch_thumbnails(images, alias):
+    """Разом проверяет миниатюры картинок страницы (FieldFile).
+
+    Результат запоминается на самих картинках, и ready_thumbnail для них
+    уже не обращается к хранилищу.
+    """
+    images = [image for image in images if image]
+    ready = ready_thumbnails([image.name for image in images], alias)
+    for image in images:
+        image.__dict__.setdefault('_ready_thumbnails', {})[alias] = (
+            ready.get(image.name)
+        )
+
+
+def generate_thumbnails(post_id, name):
+    """Генерирует все миниатюры POST_THUMBNAILS для картинки name поста."""
+    with _lock(name):
+        if not default.storage.exists(name):
+            # картинку успели заменить и удалить, пока задача ждала в очереди
+            return
+        for alias, (geometry, options) in settings.POST_THUMBNAILS.items():
+            get_thumbnail(name, geometry, **options)
+    # страницы с постом изменились: в них оригинал картинки сменится
+    # миниатюрой, а в закэшированных страницах главной остался оригинал
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+    pagecache.invalidate(pagecache.post_tag(post_id))
+    invalidate_index_cache()
+
+
+def delete_images(names):
+    """Удаляет картинки names вместе с их миниатюрами.
+
+    Файлы удаляются по одному, а ключи хранилища sorl всех картинок -
+    одним запросом. Картинки, на которые еще ссылаются посты, не трогаем.
+    """
+    names = set(names) - set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+    kvstore = default.kvstore
+    keys = list()
+    for name in names:
+        source = ImageFile(name, default.storage)
+        with _lock(name):
+            # без оригинала новые миниатюры уже не появятся
+            source.delete()
+            thumbnail_keys = kvstore._get(source.key, identity='thumbnails')
+            for key in thumbnail_keys or ():
+                thumbnail = kvstore._get(key)
+                if thumbnail:
+                    thumbnail.delete()
+                keys.append(add_prefix(key))
+        keys.append(add_prefix(source.key))
+        keys.append(add_prefix(source.key, identity='thumbnails'))
+    if keys:
+        kvstore._delete_raw(*keys)
+
+
+class ThumbnailPool:
+    """Пул потоков, выполняющих задачи с картинками из локальной очереди.
+
+    Потоки запускаются при первой задаче. При workers=0 миниатюры
+    выполняются сразу в вызывающем потоке.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.threads = list()
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            while len(self.threads) < self.workers:
+                thread = threading.Thread(
+                    target=self.work,
+                    name=f'thumbnails-{len(self.threads)}',
+                    daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, func, *args):
+        if not self.workers:
+            func(*args)
+            return
+        self.start()
+        self.queue.put((func, args))
+
+    def join(self):
+        """Ждет, пока очередь опустеет (для тестов и команд)."""
+        self.queue.join()
+
+    def work(self):
+        while True:
+            func, args = self.queue.get()
+            try:
+                func(*args)
+            except Exception:
+                logger.exception(
+                    'Задача %s%s не выполнена', func.__name__, args
+                )
+            finally:
+                self.release_connections()
+                self.queue.task_done()
+
+    def release_connections(self):
+        # исключение здесь остановило бы поток, и пул молча потерял бы
+        # рабочего: например, если база недоступна
+        try:
+            close_old_connections()
+        except Exception:
+            logger.exception('Не удалось закрыть соединения с базой')
+
+
+class Trash:
+    """Копит имена картинок к удалению и удаляет их пачками в пуле.
+
+    Пока одна пачка ждет в очереди пула, новые имена дописываются в нее,
+    так что массовое удаление постов или поток правок дают несколько
+    крупных задач, а не задачу на каждую картинку.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.names = set()
+        self.lock = threading.Lock()
+        self.pending = False
+
+    def add(self, names):
+        with self.lock:
+            self.names.update(names)
+            if self.pending:
+                return
+            self.pending = True
+        self.pool.submit(self.flush)
+
+    def flush(self):
+        with self.lock:
+            names, self.names = self.names, set()
+            self.pending = False
+        if names:
+            delete_images(names)
+
+
+pool = ThumbnailPool(settings.THUMBNAIL_WORKERS)
+trash = Trash(pool)
+
+
+def schedule(post):
+    """Ставит генерацию миниатюр поста в очередь после коммита."""
+    if post.image:
+        pk, name = post.pk, post.image.name
+        transaction.on_commit(
+            lambda: pool.submit(generate_thumbnails, pk, name)
+        )
+
+
+def discard(*names):
+    """Удаляет картинки и их миниатюры после коммита транзакции.
+
+    При откате транзакции файлы остаются на месте.
+    """
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: trash.add(names))
@@ -0,0 +1,382 @@
+# posts/transfer.py
+"""Перенос групп, постов, комментариев и подписок между окружениями.
+
+Выгрузка и загрузка идут потоком: записи читаются из базы итератором
+и пишутся построчно в JSON Lines (или CSV по файлу на модель), а при
+загрузке копятся пачками для bulk_create. В памяти держатся только
+пачка и таблицы соответствия ключей: имя пользователя -> id,
+slug группы -> id, ключ поста в выгрузке -> id поста в базе.
+"""
+import csv
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+
+from . import counters, following, pagecache, search, thumbnails, timeline
+from .caching import invalidate_index_cache
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# модели в порядке выгрузки: каждая ссылается только на предыдущие
+MODELS = ('group', 'post', 'comment', 'follow')
+
+FIELDS = {
+    'group': ('slug', 'title', 'description'),
+    'post': ('key', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comment': ('post', 'author', 'text', 'pub_date'),
+    'follow': ('user', 'author'),
+}
+
+CHUNK_SIZE = 2000
+# при стольких затронутых пользователях ленты перестраиваются все сразу,
+# а не по списку id в запросе
+REBUILD_ALL_FROM = 500
+
+
+def _rows(queryset, model, *fields):
+    for values in queryset.values_list(*fields).iterator(CHUNK_SIZE):
+        record = dict(zip(FIELDS[model], values))
+        record['model'] = model
+        yield record
+
+
+def export_records():
+    """Все записи для выгрузки по порядку MODELS, потоком из базы."""
+    yield from _rows(
+        Group.objects.order_by('pk'), 'group', 'slug', 'title', 'description'
+    )
+    for record in _rows(
+        Post.objects.order_by('pk'), 'post',
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    ):
+        record['pub_date'] = record['pub_date'].isoformat()
+        yield record
+    for record in _rows(
+        Comment.objects.order_by('pk'), 'comment',
+        'post_id', 'author__username', 'text', 'pub_date'
+    ):
+        record['pub_date'] = record['pub_date'].isoformat()
+        yield record
+    yield from _rows(
+        Follow.objects.order_by('pk'), 'follow',
+        'user__username', 'author__username'
+    )
+
+
+def write_jsonl(records, stream):
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        count += 1
+    return count
+
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def write_csv(records, directory):
+    """Пишет записи в <directory>/<model>.csv, по файлу на модель."""
+    os.makedirs(directory, exist_ok=True)
+    files, writers = dict(), dict()
+    count = 0
+    try:
+        for record in records:
+            model = record.pop('model')
+            if model not in writers:
+                files[model] = open(
+                    os.path.join(directory, f'{model}.csv'), 'w',
+                    newline='', encoding='utf-8'
+                )
+                writers[model] = csv.DictWriter(files[model], FIELDS[model])
+                writers[model].writeheader()
+            writers[model].writerow(record)
+            count += 1
+    finally:
+        for file in files.values():
+            file.close()
+    return count
+
+
+def read_csv(directory):
+    for model in MODELS:
+        path = os.path.join(directory, f'{model}.csv')
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as file:
+            for record in csv.DictReader(file):
+                record['model'] = model
+                yield record
+
+
+@contextmanager
+def keep_pub_date():
+    """Отключает auto_now_add у дат, чтобы сохранить даты из выгрузки."""
+    fields = [
+        model._meta.get_field('pub_date') for model in (Post, Comment)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загружает записи выгрузки пачками через bulk_create.
+
+    media_dir - каталог MEDIA_ROOT исходного окружения: картинки постов
+    копируются (или, при link=True, связываются жесткими ссылками)
+    из него в хранилище в workers потоков. Без media_dir имена картинок
+    сохраняются как есть - файлы должны уже лежать в хранилище.
+    Сигналы при bulk_create не срабатывают, поэтому счетчики, ленты
+    подписок и поисковый индекс обновляются в конце загрузки.
+    """
+
+    def __init__(self, batch_size=1000, media_dir=None, link=False,
+                 workers=4, create_users=False):
+        self.batch_size = batch_size
+        self.media_dir = media_dir
+        self.link = link
+        self.workers = workers
+        self.create_users = create_users
+        # таблицы соответствия ключей выгрузки и id в базе
+        self.users = dict()
+        # имена, которых нет в базе: записи с ними пропускаются
+        self.unknown = set()
+        self.groups = dict()
+        self.posts = dict()
+        self.imported = Counter()
+        self.skipped = Counter()
+        self.elapsed = Counter()
+        self.images = set()
+        self.authors = set()
+        self.followers = set()
+        self.next_post_pk = None
+
+    def run(self, records):
+        batch, model = list(), None
+        with transaction.atomic(), keep_pub_date():
+            self.next_post_pk = (
+                Post.objects.aggregate(last=Max('pk'))['last'] or 0
+            ) + 1
+            for record in records:
+                if record['model'] != model or len(batch) >= self.batch_size:
+                    self.flush(model, batch)
+                    batch, model = list(), record['model']
+                batch.append(record)
+            self.flush(model, batch)
+            self.finish()
+        for pk, name in self.images:
+            thumbnails.pool.submit(thumbnails.generate_thumbnails, pk, name)
+        thumbnails.pool.join()
+
+    def flush(self, model, batch):
+        if not batch:
+            return
+        if model not in MODELS:
+            self.skipped[model] += len(batch)
+            return
+        started = time.perf_counter()
+        getattr(self, f'import_{model}')(batch)
+        self.elapsed[model] += time.perf_counter() - started
+
+    def resolve_users(self, usernames):
+        missing = {
+            username for username in usernames
+            if username not in self.users and username not in self.unknown
+        }
+        if not missing:
+            return
+        self.users.update(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'pk')
+        )
+        missing = {username for username in missing
+                   if username not in self.users}
+        if missing and not self.create_users:
+            self.unknown.update(missing)
+        elif missing:
+            # у созданных авторов нет пароля, войти они смогут после сброса
+            password = make_password(None)
+            User.objects.bulk_create(
+                User(username=username, password=password)
+                for username in missing
+            )
+            self.users.update(
+                User.objects.filter(username__in=missing)
+                .values_list('username', 'pk')
+            )
+
+    def import_group(self, batch):
+        slugs = [record['slug'] for record in batch]
+        self.groups.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'pk')
+        )
+        new = [record for record in batch if record['slug'] not in self.groups]
+        Group.objects.bulk_create(
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record['description'],
+            ) for record in new
+        )
+        self.groups.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'pk')
+        )
+        self.imported['group'] += len(new)
+        self.skipped['group'] += len(batch) - len(new)
+
+    def import_post(self, batch):
+        self.resolve_users(record['author'] for record in batch)
+        self.resolve_groups(record['group'] for record in batch)
+        found = [
+            record for record in batch if record['author'] in self.users
+        ]
+        self.skipped['post'] += len(batch) - len(found)
+        batch = found
+        images = self.copy_images(record['image'] for record in batch)
+        posts = list()
+        for record, image in zip(batch, images):
+            pk = self.next_post_pk
+            self.next_post_pk += 1
+            self.posts[int(record['key'])] = pk
+            posts.append(Post(
+                pk=pk,
+                author_id=self.users[record['author']],
+                group_id=self.groups.get(record['group']),
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+                image=image,
+            ))
+            self.authors.add(self.users[record['author']])
+        Post.objects.bulk_create(posts)
+        search.get_index().add((post.pk, post.text) for post in posts)
+        self.images.update(
+            (post.pk, post.image.name) for post in posts if post.image
+        )
+        self.imported['post'] += len(posts)
+
+    def resolve_groups(self, slugs):
+        missing = {slug for slug in slugs if slug and slug not in self.groups}
+        if missing:
+            self.groups.update(
+                Group.objects.filter(slug__in=missing)
+                .values_list('slug', 'pk')
+            )
+
+    def import_comment(self, batch):
+        self.resolve_users(record['author'] for record in batch)
+        comments = [
+            Comment(
+                post_id=self.posts[int(record['post'])],
+                author_id=self.users[record['author']],
+                text=record['text'],
+                pub_date=parse_datetime(record['pub_date']),
+            ) for record in batch
+            if int(record['post']) in self.posts
+            and record['author'] in self.users
+        ]
+        Comment.objects.bulk_create(comments)
+        self.imported['comment'] += len(comments)
+        self.skipped['comment'] += len(batch) - len(comments)
+
+    def import_follow(self, batch):
+        self.resolve_users(
+            username for record in batch
+            for username in (record['user'], record['author'])
+        )
+        pairs = {
+            (self.users[record['user']], self.users[record['author']])
+            for record in batch
+            if record['user'] in self.users
+            and record['author'] in self.users
+            and record['user'] != record['author']
+        }
+        # уже существующие подписки пропускаются
+        pairs -= set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        follows = [
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ]
+        Follow.objects.bulk_create(follows)
+        self.followers.update(follow.user_id for follow in follows)
+        self.imported['follow'] += len(follows)
+        self.skipped['follow'] += len(batch) - len(follows)
+
+    def copy_image(self, name):
+        """Кладет картинку name в хранилище, возвращает ее новое имя."""
+        source = os.path.join(self.media_dir, name)
+        if not os.path.isfile(source):
+            return ''
+        if not self.link:
+            with open(source, 'rb') as file:
+                return default_storage.save(name, File(file))
+        while True:
+            target = default_storage.get_available_name(name)
+            path = default_storage.path(target)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(source, path)
+            except FileExistsError:
+                # имя заняли параллельно - берем следующее
+                continue
+            except OSError:
+                # другой диск - жесткая ссылка невозможна
+                shutil.copyfile(source, path)
+            return target
+
+    def copy_images(self, names):
+        names = [name or '' for name in names]
+        if self.media_dir is None:
+            return names
+        with ThreadPoolExecutor(self.workers) as executor:
+            images = list(executor.map(
+                lambda name: self.copy_image(name) if name else '', names
+            ))
+        self.skipped['image'] += sum(
+            1 for name, image in zip(names, images) if name and not image
+        )
+        return images
+
+    def finish(self):
+        """Досчитывает то, что при обычном сохранении делают сигналы."""
+        with connection.cursor() as cursor:
+            # на PostgreSQL последовательность pk не знает о явных pk постов
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                cursor.execute(sql)
+        for model in counters.RECONCILE:
+            counters.reconcile(model)
+        following.invalidate(self.followers)
+        if len(self.authors) + len(self.followers) > REBUILD_ALL_FROM:
+            timeline.rebuild_timelines()
+        elif self.authors or self.followers:
+            timeline.rebuild_timelines(
+                User.objects.filter(
+                    Q(pk__in=self.followers)
+                    | Q(follower__author__in=self.authors)
+                ).distinct()
+            )
+        invalidate_index_cache()
+        pagecache.invalidate_all()
@@ -1,81 +1,244 @@
 # posts/views.py
+import time
+from datetime import datetime, timezone
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
+from django.utils.http import urlencode
+
+from core import routers
 
+from . import pagecache
+from .caching import index_cache_version, page_cache_key
+from .conditional import conditional_render, feed_state, page_state
+from .following import is_following
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from .models import Comment, Follow, Group, Post
+from .paginators import CursorPaginator, chronological_window
+from .search import SearchResults
+from .timeline import follow_feed
 
 User = get_user_model()
 
 
 def paginator(request, list_object):
+    # ленты, перечисленные в PAGINATOR_CURSOR_VIEWS, листаются курсором
+    # (?after= / ?before=) без COUNT(*) и OFFSET
+    url_name = getattr(request.resolver_match, 'url_name', None)
+    if url_name in settings.PAGINATOR_CURSOR_VIEWS:
+        paginator = CursorPaginator(list_object, settings.PAGINATOR_PER_PAGE)
+        return paginator.get_cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
     paginator = Paginator(list_object, settings.PAGINATOR_PER_PAGE)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
 
 
 # Главная страница
+@pagecache.cache_anonymous_page
 def index(request):
+    version = index_cache_version()
+    # фрагмент шаблона кэшируется под новым поколением при первом показе:
+    # пока реплики могут отставать от смены поколения, читаем из основной
+    lag = settings.DATABASE_PIN_SECONDS * 10 ** 9
+    recent = time.time_ns() - version < lag
+    with routers.primary(recent):
+        return _index(request, version)
+
+
+def _index(request, version):
     # сортировка по убыванию даты публикации указана через класс Meta в модели
-    post_list = Post.objects.all()
+    # автор и группа нужны шаблону карточки поста - берем их одним JOIN
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = paginator(request, post_list)
     context = {
         'page_obj': page_obj,
-        'index': True
+        'index': True,
+        # список постов кэшируется в шаблоне отдельно для каждой страницы
+        # и сбрасывается сигналами при сохранении/удалении поста
+        'index_cache_timeout': settings.INDEX_PAGE_CACHE_TIMEOUT,
+        'index_cache_version': version,
+        'index_cache_page': page_cache_key(page_obj),
     }
-    return render(request, 'posts/index.html', context)
+    # посты страницы загружаются, только если ее кэширует кэш страниц:
+    # при попадании в кэш фрагмента шаблону они не нужны
+    if pagecache.collecting(request):
+        pagecache.depends(
+            request, pagecache.FEED_INDEX, *pagecache.posts_tags(page_obj)
+        )
+    # страница главной меняется вместе с поколением своего кэша (его
+    # сбрасывают и посты, и комментарии), поэтому валидаторы строятся по
+    # нему, не загружая посты; поколение - время последнего изменения в
+    # наносекундах
+    return conditional_render(
+        request, 'posts/index.html', context,
+        parts=(version, page_cache_key(page_obj)),
+        last_modified=datetime.fromtimestamp(version / 10 ** 9, timezone.utc)
+    )
 
 
 # View-функция для страницы сообщества:
+@pagecache.cache_anonymous_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
 
     # посты группы выбранны через related_name (posts),
     # сортировка по убыванию даты публикации указана через класс Meta в модели
-    post_list = group.posts.all()
+    post_list = group.posts.select_related('author', 'group')
     page_obj = paginator(request, post_list)
     context = {
         'page_obj': page_obj,
         'group': group,
     }
-    return render(request, 'posts/group_list.html', context)
+    tags = (
+        pagecache.group_tag(group.pk),
+        pagecache.group_feed_tag(group.pk),
+        *pagecache.posts_tags(page_obj)
+    )
+    pagecache.depends(request, *tags)
+    versions, last_modified = pagecache.validators(request, *tags)
+    return conditional_render(
+        request, 'posts/group_list.html', context,
+        parts=(
+            group.title, group.description, feed_state(page_obj), versions
+        ),
+        last_modified=last_modified
+    )
 
 
+@pagecache.cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    # счетчики постов и подписок автора выводятся в шапке профиля
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
     # посты автора выбранны через related_name (posts),
     # сортировка по убыванию даты публикации указана через класс Meta в модели
-    post_list = author.posts.all()
+    post_list = author.posts.select_related('author', 'group')
     page_obj = paginator(request, post_list)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
-    )
+    # подписки пользователя берутся из кэша, без запроса к базе
+    following = is_following(request.user, author.pk)
     context = {
         'page_obj': page_obj,
         'author': author,
         'following': following
     }
-    return render(request, 'posts/profile.html', context)
+    counters = getattr(author, 'counters', None)
+    tags = (
+        pagecache.user_tag(author.pk),
+        pagecache.counters_tag(author.pk),
+        pagecache.author_feed_tag(author.pk),
+        *pagecache.posts_tags(page_obj)
+    )
+    pagecache.depends(request, *tags)
+    versions, last_modified = pagecache.validators(request, *tags)
+    return conditional_render(
+        request, 'posts/profile.html', context,
+        parts=(
+            author.get_full_name(),
+            counters and (counters.posts_count, counters.followers_count,
+                          counters.following_count),
+            following,
+            feed_state(page_obj),
+            versions,
+        ),
+        last_modified=last_modified
+    )
 
 
+@pagecache.cache_anonymous_page
 def post_detail(request, post_id):
     # Здесь код запроса к модели и создание словаря контекста
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id
+    )
+    comments, comments_next = comments_window(request, post.pk)
     form = CommentForm()
     context = {
         'post': post,
+        'post_id': post.pk,
         'form': form,
         'form_comment_action': reverse('posts:add_comment',
                                        kwargs={'post_id': post_id}),
-        'comments': comments
+        'comments': comments,
+        'comments_next': comments_next,
     }
-    return render(request, 'posts/post_detail.html', context)
+    counters = getattr(post.author, 'counters', None)
+    tags = (
+        # число постов автора меняется вместе с лентой его постов
+        pagecache.author_feed_tag(post.author_id),
+        *pagecache.posts_tags([post]),
+        *(pagecache.user_tag(comment.author_id) for comment in comments)
+    )
+    pagecache.depends(request, *tags)
+    versions, last_modified = pagecache.validators(request, *tags)
+    return conditional_render(
+        request, 'posts/post_detail.html', context,
+        parts=(
+            post.pk,
+            post.updated.timestamp(),
+            post.author.get_full_name(),
+            post.group and post.group.title,
+            counters and counters.posts_count,
+            page_state(comments),
+            comments_next,
+            versions,
+        ),
+        last_modified=last_modified
+    )
+
+
+def comments_window(request, post_id):
+    # комментарии листаются курсором от старых к новым, авторы приходят
+    # тем же запросом; окно идет по индексу (post, pub_date)
+    return chronological_window(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        request.GET.get('after'),
+        settings.COMMENTS_PER_PAGE
+    )
+
+
+@pagecache.cache_anonymous_page
+def post_comments(request, post_id):
+    # следующая порция комментариев для подгрузки на странице поста:
+    # HTML-фрагмент, а с ?format=json - JSON
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments, comments_next = comments_window(request, post_id)
+    pagecache.depends(
+        request,
+        pagecache.post_tag(post_id),
+        *(pagecache.user_tag(comment.author_id) for comment in comments)
+    )
+    if request.GET.get('format') == 'json':
+        return JsonResponse(
+            {
+                'comments': [
+                    {
+                        'id': comment.pk,
+                        'author': comment.author.username,
+                        'text': comment.text,
+                        'pub_date': comment.pub_date.isoformat(),
+                    }
+                    for comment in comments
+                ],
+                'next': comments_next,
+            },
+            json_dumps_params={'ensure_ascii': False}
+        )
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+        'comments_next': comments_next,
+    }
+    return render(request, 'posts/includes/comments.html', context)
 
 
 @login_required
@@ -84,6 +247,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
+        # миниатюры новой картинки готовятся в фоне (сигнал post_save),
+        # до тех пор в ленте - оригинал
         post.save()
         return redirect('posts:profile', username=request.user.username)
     return render(request, 'posts/create_post.html', {'form': form})
@@ -126,12 +291,10 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    # авторы на которых подписан пользователь выбранны
-    # через related_name (following),
-    # сортировка по убыванию даты публикации указана через класс Meta в модели
-    user = request.user
-    post_list = Post.objects.filter(author__following__user=user).all()
-    page_obj = paginator(request, post_list)
+    # лента подписок материализована в TimelineEntry при публикации постов
+    # и читается проходом по индексу (user, -pub_date, -post); посты авторов
+    # с очень большим числом подписчиков подмешиваются при чтении
+    page_obj = paginator(request, follow_feed(request.user))
     context = {
         'page_obj': page_obj,
         'follow': True,
@@ -139,18 +302,39 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+def search(request):
+    # посты ищутся по основам слов в полнотекстовом индексе
+    # и упорядочены по релевантности (BM25)
+    query = request.GET.get('q', '').strip()
+    page_obj = paginator(request, SearchResults(query))
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'paginator_query': urlencode({'q': query}) + '&' if query else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    # для подписки нужен только id автора, сам пользователь не загружается
+    author_id = get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username
+    )
+    if author_id != request.user.pk:
+        Follow.objects.get_or_create(user=request.user, author_id=author_id)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     # Дизлайк, отписка
-    author = get_object_or_404(User, username=username)
-    follow = get_object_or_404(Follow, user=request.user, author=author)
-    follow.delete()
+    author_id = get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username
+    )
+    deleted, _ = Follow.objects.filter(
+        user=request.user, author_id=author_id
+    ).delete()
+    if not deleted:
+        raise Http404
     return redirect('posts:profile', username=username)
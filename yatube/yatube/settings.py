@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.instrumentation.InstrumentationMiddleware',
+    'core.middleware.replicas.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,6 +93,46 @@ DATABASES = {
     }
 }
 
+# PRAGMA, которые core.sqlite выполняет на каждом соединении с SQLite;
+# профиль выбирается переменной окружения YATUBE_SQLITE_PROFILE.
+# 'production' - WAL (читатели не ждут записи), ожидание блокировки
+# вместо ошибки, отображение файла в память и кэш страниц побольше.
+# journal_mode и auto_vacuum сохраняются в файле базы; обслуживание -
+# команда sqlite_maintenance (по cron или с --interval)
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 5000,
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        # отрицательное значение - размер в КБ, а не в страницах
+        'cache_size': -64 * 1024,
+        'auto_vacuum': 'INCREMENTAL',
+    },
+}
+SQLITE_PROFILE = os.environ.get('YATUBE_SQLITE_PROFILE', 'default')
+
+# реплики только для чтения: пути к копиям базы через os.pathsep
+# в YATUBE_DB_REPLICAS (копии обновляет команда sync_replicas). Чтения
+# запросов к сайту идут в реплики, записи - в default
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(os.pathsep)),
+    start=1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# сколько секунд после записи чтения пользователя идут в default, чтобы
+# он видел свои изменения, пока реплики их не получили; столько же после
+# смены поколения кэша главной ее фрагменты собираются из default
+DATABASE_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -142,11 +184,142 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # number of items to include on a page for Paginator
 PAGINATOR_PER_PAGE = 10
+# url name лент, которые листаются курсором (?after= / ?before=)
+# вместо номеров страниц: 'index', 'group_list', 'profile', 'follow_index'
+PAGINATOR_CURSOR_VIEWS = ()
+# списки админки для таблиц, где строк не меньше этого числа, вместо
+# COUNT(*) по всей таблице показывают оценку (пока не задан фильтр)
+PAGINATOR_ESTIMATED_COUNT_THRESHOLD = 100000
+# сколько комментариев к посту показывается сразу и подгружается
+# за раз по кнопке «Показать еще»
+COMMENTS_PER_PAGE = 50
+# сколько последних постов в RSS- и Atom-лентах
+FEED_ITEMS = 20
+# JSON API лент (/api/v1/): постов в ответе и длина отрывка текста поста
+API_PAGE_SIZE = 20
+API_EXCERPT_LENGTH = 200
+# сколько секунд long-poll запрос за новыми постами ждет их появления;
+# каждый ожидающий запрос занимает поток обработчика
+LONGPOLL_TIMEOUT = 25
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
-CACHES = {
-    'default': {
+# сколько последних постов хранится в материализованной ленте подписок
+TIMELINE_MAX_LENGTH = 1000
+# посты авторов, у которых не меньше подписчиков, не раскладываются
+# по лентам при публикации, а подмешиваются при чтении; None - всегда
+# раскладывать. После смены порога запустите rebuild_timelines
+TIMELINE_FANOUT_THRESHOLD = 10000
+# как долго кэшируется список таких авторов, секунды
+TIMELINE_CELEBRITIES_CACHE_TIMEOUT = 5 * 60
+
+# как долго кэшируется множество авторов, на которых подписан пользователь,
+# секунды; подписка и отписка правят его сразу
+FOLLOWING_CACHE_TIMEOUT = 24 * 60 * 60
+
+# время жизни кэша страниц главной ленты, секунды; кэш сбрасывается
+# сигналами при сохранении и удалении постов
+INDEX_PAGE_CACHE_TIMEOUT = 60 * 60
+
+# сколько секунд обратный прокси может отдавать анонимным посетителям
+# закэшированные страницы постов и лент (Cache-Control: s-maxage);
+# браузеры сверяют ETag при каждом запросе
+PAGE_SHARED_MAX_AGE = 60
+
+# сколько секунд страницы постов и лент хранятся в кэше страниц для
+# анонимных посетителей; сигналы сбрасывают ровно те страницы, где видны
+# измененные посты, группы и авторы. 0 - кэш страниц выключен
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# загрузки крупнее этого размера Django пишет на диск по частям,
+# а не держит в памяти
+FILE_UPLOAD_MAX_MEMORY_SIZE = 512 * 1024
+# картинки постов больше этого числа точек отклоняются по заголовку файла
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# предел для PNG, GIF, WebP и других форматов, которые не декодируются
+# в уменьшенном масштабе: их растр при уменьшении держится в памяти целиком
+# (до 4 байт на точку, 48 МБ при 12 млн точек)
+POST_IMAGE_MAX_FULL_DECODE_PIXELS = 12 * 1000 * 1000
+# картинки больше этого размера по большей стороне уменьшаются при приеме
+POST_IMAGE_MAX_SIDE = 2560
+
+# миниатюры картинок постов: псевдоним -> (геометрия, опции sorl);
+# генерируются в фоне после сохранения поста, шаблоны берут их по псевдониму
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# число фоновых потоков генерации миниатюр; 0 - генерировать сразу
+THUMBNAIL_WORKERS = 2
+
+# индекс полнотекстового поиска по постам: 'fts5' - виртуальная таблица
+# SQLite FTS5, 'table' - инвертированный индекс в обычных таблицах,
+# 'auto' - FTS5, если SQLite собран с ним. После смены индекса или
+# изменения постов в обход сигналов запустите reindex_posts
+POST_SEARCH_BACKEND = 'auto'
+
+# кэш выбирается переменной окружения YATUBE_CACHE. У 'locmem' он свой
+# в каждом процессе, поэтому при нескольких процессах на сервере задайте
+# общий: 'file' - каталог на диске (YATUBE_CACHE_LOCATION, по умолчанию
+# cache/ рядом с manage.py) или 'memcached' - локальный memcached
+# (YATUBE_CACHE_LOCATION, по умолчанию 127.0.0.1:11211, нужен пакет
+# python-memcached)
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('YATUBE_CACHE_LOCATION', '127.0.0.1:11211'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+}
+
+# значения, которые posts кладет в кэш через posts.caching.remember,
+# пересчитывает один процесс; остальные столько секунд после срока
+# получают прежнее значение
+CACHE_STALE_TIMEOUT = 60
+# на сколько секунд берется блокировка пересчета и сколько ждут
+# значения, если прежнего нет
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 2
+# упреждение пересчета горячих значений: 0 - строго по сроку, больше 1 -
+# раньше срока
+CACHE_EARLY_EXPIRATION_BETA = 1.0
+
+# доля запросов, для которых собираются замеры: время ответа, число
+# и время SQL-запросов, повторяющиеся запросы, время рендеринга шаблонов,
+# попадания и промахи кэша; 0 - middleware замеров отключена
+REQUEST_METRICS_SAMPLE_RATE = 0
+# куда отправлять замеры: функция, принимающая словарь
+REQUEST_METRICS_SINK = 'core.middleware.instrumentation.log_metrics'
+# запрос, выполненный за один HTTP-запрос столько раз, считается
+# повторяющимся (признак N+1)
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # замеры запросов, по JSON-строке на запрос
+        'yatube.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }